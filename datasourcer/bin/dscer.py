@@ -1,135 +1,414 @@
+from __future__ import annotations
+
 import argparse
+import atexit
+import hashlib
+import inspect
 import logging
-from glob import glob
-from os.path import (abspath, basename, dirname, exists, getsize, isdir,
-                     isfile, join)
+import os
+import pickle
+import stat
+import sys
+from enum import Enum
+from os.path import abspath
 from pathlib import Path
-from pdb import set_trace as bp
+from typing import (TYPE_CHECKING, Any, Dict, Iterator, List,
+                    Optional, Set, Tuple)
+
+# the library modules pull in requests, yaml, etc.; they're imported where they're used (rather than here) so that e.g. --help doesn't pay for them
+if TYPE_CHECKING:
+    import datasourcer.datasourcer as dscer
+    import datasourcer.marshalling as dscer_marshall
+
+# on-disk cache of parsed datasource files; entries are keyed by (file path, data root) and stamped with the file's (mtime, size), so a file is only re-parsed when it changes
+_PARSE_CACHE_DIR = Path.home() / ".cache" / "dscer"
+_parse_cache_path: Optional[Path] = None
+_parse_cache: Optional[Dict[Tuple[str, str], Tuple[Tuple[int, int], Any]]] = None
+_parse_cache_dirty = False
+
+# the cache keys looked up by this run
+_parse_cache_seen: Set[Tuple[str, str]] = set()
+
+
+# a digest of the layout (fields, slots, enum members) of the classes the parsed trees are pickled from; when any of it changes, old pickles no longer fit, and the cache file name changes with it
+def _tree_layout_digest() -> str:
+    import datasourcer.datasourcer as dscer
+
+    layout = []
+
+    for name, cls in sorted(vars(dscer).items()):
+        if not inspect.isclass(cls) or cls.__module__ != dscer.__name__:
+            continue
+
+        cls_fields = [
+            (f.name, str(f.type))
+            for f in getattr(cls, "__dataclass_fields__", {}).values()
+        ]
+        slots = list(getattr(cls, "__slots__", ()))
+        members = list(cls.__members__) if issubclass(cls, Enum) else []
+
+        layout.append((name, cls_fields, slots, members))
+
+    return hashlib.sha1(repr(layout).encode()).hexdigest()[:12]
+
+
+def _get_parse_cache_path() -> Path:
+    global _parse_cache_path
+
+    if _parse_cache_path is None:
+        _parse_cache_path = _PARSE_CACHE_DIR / f"parse_cache_{_tree_layout_digest()}.pkl"
+
+    return _parse_cache_path
+
+
+def _get_parse_cache() -> Dict[Tuple[str, str], Tuple[Tuple[int, int], Any]]:
+    global _parse_cache
+
+    # loaded at most once per process; flushed back to disk on exit
+    if _parse_cache is None:
+        _parse_cache = {}
+        cache_path = _get_parse_cache_path()
+
+        try:
+            with open(cache_path, "rb") as cache_file:
+                _parse_cache = pickle.load(cache_file)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logging.warning(f"Ignoring unreadable parse cache ({cache_path}): {e}")
+
+        atexit.register(_flush_parse_cache)
+
+    return _parse_cache
+
+
+def _flush_parse_cache() -> None:
+    from datasourcer.datasourcer import write_file_atomic
+
+    if _parse_cache is None:
+        return
+
+    # entries for datasource files this run didn't look at & that are gone (deleted, renamed) would otherwise stay in the cache for good; files that are still there may just belong to another run's datasource dir
+    stale = [
+        key
+        for key in _parse_cache
+        if key not in _parse_cache_seen and not os.path.exists(key[0])
+    ]
+
+    for key in stale:
+        del _parse_cache[key]
+
+    if not _parse_cache_dirty and not stale:
+        return
+
+    cache_path = _get_parse_cache_path()
+
+    try:
+        os.makedirs(cache_path.parent, exist_ok=True)
+        write_file_atomic(
+            cache_path,
+            pickle.dumps(_parse_cache, protocol=pickle.HIGHEST_PROTOCOL),
+        )
+
+    except Exception as e:
+        logging.warning(f"Failed to write parse cache ({cache_path}): {e}")
+
+
+def _refresh_snapshots(parsed_ds: dscer.DataCollection) -> None:
+    import datasourcer.datasourcer as dscer
+
+    # snapshots are scanned from the data directory at parse time, and may have changed since a cached parse
+    def refresh(tv: dscer.Traversable, depth=0):
+        if isinstance(tv, dscer.DynamicResource):
+            tv.update_snapshots()
+
+    for datasource in parsed_ds.values():
+        if datasource is not None:
+            datasource.apply(refresh)
+
+
+def _cached_parse_iter(
+    file_infos: List[dscer_marshall.FileInfo], ctx: dscer.DataContext
+) -> Iterator[Optional[dscer.DataCollection]]:
+    import datasourcer.marshalling as dscer_marshall
+
+    global _parse_cache_dirty
+
+    cache = _get_parse_cache()
+
+    keys = [(abspath(info.path), str(ctx.root_path)) for info in file_infos]
+    _parse_cache_seen.update(keys)
+    hits: Dict[int, dscer.DataCollection] = {}
+    misses = []
+
+    for idx, (info, key) in enumerate(zip(file_infos, keys)):
+        have_cached = cache.get(key)
+
+        if have_cached is not None and have_cached[0] == (info.mtime_ns, info.size):
+            hits[idx] = have_cached[1]
+        else:
+            misses.append(info)
+
+    # only the changed/new files get parsed (as one batch, so they can be parsed in parallel; run() is only ever called from behind a __main__ guard); results are yielded in input order as they arrive
+    parsed_misses = dscer_marshall.iter_parse_datasource_files(
+        misses, ctx, parallel=True
+    )
+
+    for idx, (info, key) in enumerate(zip(file_infos, keys)):
+        if idx in hits:
+            _refresh_snapshots(hits[idx])
+            yield hits[idx]
+            continue
+
+        parsed_ds = next(parsed_misses)
+
+        if parsed_ds is not None:
+            cache[key] = ((info.mtime_ns, info.size), parsed_ds)
+            _parse_cache_dirty = True
+
+        yield parsed_ds
+
+
+def _cached_parse_many(
+    file_infos: List[dscer_marshall.FileInfo], ctx: dscer.DataContext
+) -> List[Optional[dscer.DataCollection]]:
+    return list(_cached_parse_iter(file_infos, ctx))
+
 
-import datasourcer.datasourcer as dscer
-import datasourcer.marshalling as dscer_marshall
+def _cached_parse(
+    fp: Path,
+    ctx: dscer.DataContext,
+    file_info: Optional[dscer_marshall.FileInfo] = None,
+) -> Optional[dscer.DataCollection]:
+    import datasourcer.marshalling as dscer_marshall
 
+    # reuse prefetched metadata (e.g. from a directory scan) if we have it; otherwise one stat answers both "is it there" and "is it a file"
+    if file_info is None:
+        try:
+            st = os.stat(fp)
+        except OSError:
+            st = None
 
-def process_args(args: argparse.Namespace):
+        if st is None or not stat.S_ISREG(st.st_mode):
+            logging.error(
+                f'Provided datasource file path does not exist or is not a file: "{fp}"'
+            )
+            return None
 
-    print(args)
+        file_info = dscer_marshall.FileInfo(
+            path=Path(fp), size=st.st_size, mtime_ns=st.st_mtime_ns
+        )
+
+    return _cached_parse_many([file_info], ctx)[0]
+
+
+# returns whether everything that was asked for went through
+def process_args(args: argparse.Namespace) -> bool:
+    import datasourcer.datasourcer as dscer
+    import datasourcer.marshalling as dscer_marshall
 
-    data_dst_path = Path(args.data_directory)
+    logging.debug("args: %s", args)
+
+    data_dst_path = args.data_directory
     do_download = args.download
     do_download_dynamic = args.download_dynamic
     do_validate = args.validate
     do_process = args.process
     qualifier = args.qualifier
     bpt = args.breakpt
+
+    # parsing is the expensive part of a run; don't do it if nothing would be done with the result
+    any_action = any(
+        (do_download, do_validate, do_process, do_download_dynamic, args.print_tree, bpt)
+    )
+    if not any_action and not qualifier:
+        logging.info(
+            "No action requested (e.g. --download, --validate, --process); nothing to do"
+        )
+        return True
+
     d_ctx = dscer.DataContext(root_path=data_dst_path)
 
     datasources: dscer.DataCollection = {}
 
-    def join_ds_file(fp, ds, ctx):
-        parsed_ds = dscer_marshall.parse_datasource_file(fp, ctx)
+    def join_ds_file(fp, ds, ctx, file_info=None):
+        parsed_ds = _cached_parse(fp, ctx, file_info=file_info)
 
         if parsed_ds is not None:
-            # return {**ds, **parsed_ds}
-            return join_ds(ds, parsed_ds)
+            return merge_into(ds, parsed_ds)
 
         else:
-            return False
+            return ds
 
-    def join_ds(
+    # merges d2 into d1 in place (rather than rebuilding the accumulated collection per file), returning d1
+    def merge_into(
         d1: dscer.DataCollection, d2: dscer.DataCollection
     ) -> dscer.DataCollection:
-        return {**d1, **d2}
+        d1.update(d2)
+        return d1
 
-    def apply_args(
-        dst: dscer.DatasetType, validate: bool, download: bool, process: bool
+    def wrap_apply(
+        download: bool,
+        process: bool,
+        download_dynamic: bool,
+        pending: List[dscer.PendingWork],
+        to_process: List[dscer.Traversable],
     ):
-        if validate:
-            pass
+        executor = dscer.get_executor()
 
-        if download:
-            # download(dst, download_types=[])
-            dst.download(validate_existing=True, reload_unconfirmable=False)
+        # nodes already visited, & leaves already submitted for download; overlapping qualifiers can reach the same node more than once, and two workers must never write the same file
+        seen = set()
+        seen_leaves = set()
 
-        if process:
-            dst.process()
+        def visit(tv: dscer.Traversable, depth=0):
+            caps = tv._CAPS
 
-    def wrap_apply(
-        validate: bool, download: bool, process: bool, download_dynamic: bool
-    ):
-        def fn(tv: dscer.Traversable, depth=0):
-            if download_dynamic and isinstance(tv, dscer.DynamicResource):
-                if tv.can_download():
-                    tv.retrieve_snapshot()
-
-            if (
-                download
-                and (
-                    isinstance(tv, dscer.Downloadable)
-                    or isinstance(tv, dscer.RemoteSubset)
-                )
-                and not isinstance(tv, dscer.DynamicResource)
-            ):
-                if tv.can_download():
-                    tv.download(level=depth)
-
-            if process and isinstance(tv, dscer.Processable):
-                if tv.can_process():
-                    tv.process()
-
-        return fn
-
-    apply_fn = wrap_apply(do_validate, do_download, do_process, do_download_dynamic)
+            # nothing to do for this node
+            if not caps & (dscer.CAP_DYNAMIC | dscer.CAP_PROCESS) or id(tv) in seen:
+                return
+
+            seen.add(id(tv))
+
+            if download_dynamic and caps & dscer.CAP_DYNAMIC and tv.can_download():
+                pending.append((tv, executor.submit(tv.retrieve_snapshot)))
+
+            # processing works on downloaded files, so it's held back until the downloads are done
+            if process and caps & dscer.CAP_PROCESS and tv.can_process():
+                to_process.append(tv)
+
+        def apply_to(root: dscer.Traversable):
+            # the same fan-out the library's downloads use (directory listings, HEAD prefetch, the shared executor), each leaf with its own validation defaults
+            if download:
+                pending.extend(dscer.submit_leaf_downloads(root, seen=seen_leaves))
+
+            if download_dynamic or process:
+                root.apply(visit)
+
+        return apply_to
 
     # grab any specified datasources
 
+    # stat the datasource directory's files once, up front; shared by the datasource_file and datasource_dir handling below
+    ds_dir_metadata = None
+    if args.datasource_dir is not None:
+        ds_dir_metadata = dscer_marshall.prefetch_metadata(args.datasource_dir)
+
+    # the per-node work (mostly downloads) is network-bound and independent between nodes, so it's handed to the library's shared executor as the tree is walked
+    pending: List[dscer.PendingWork] = []
+    to_process: List[dscer.Traversable] = []
+    apply_to = wrap_apply(
+        do_download,
+        do_process,
+        do_download_dynamic,
+        pending,
+        to_process,
+    )
+
+    # qualifiers need the whole tree before they can be resolved, but otherwise each datasource is applied as soon as its file is parsed, so downloads get going while the remaining files are still being parsed
+    stream_apply = not qualifier
+
     # handle datasource_file
     if args.datasource_file is not None:
-        ds_file_path = Path(args.datasource_file)
-        datasources = join_ds_file(ds_file_path, datasources, d_ctx)
+        ds_file_path = args.datasource_file
+        ds_file_info = (ds_dir_metadata or {}).get(abspath(ds_file_path))
+        datasources = join_ds_file(ds_file_path, datasources, d_ctx, ds_file_info)
+
+        if stream_apply:
+            for datasource in datasources.values():
+                if datasource is not None:
+                    apply_to(datasource)
 
     # handle datasource dir
-    if args.datasource_dir is not None:
-        dir_dsources = dscer_marshall.datasources_from_dir(
-            args.datasource_dir, data_dst_path
+    if ds_dir_metadata is not None:
+        ds_dir_files = list(ds_dir_metadata.values())
+        logging.info(
+            f"Found files in provided path({args.datasource_dir}): {[str(info.path) for info in ds_dir_files]}"
         )
 
-        if dir_dsources:
-            datasources = join_ds(dir_dsources, datasources)
+        for parsed_ds in _cached_parse_iter(ds_dir_files, d_ctx):
+            if parsed_ds is None:
+                continue
+
+            for name, datasource in parsed_ds.items():
+                # the first definition of a name wins (the datasource_file's, then the dir's in scan order), since it may already be underway
+                if name in datasources:
+                    continue
+
+                datasources[name] = datasource
+
+                if stream_apply and datasource is not None:
+                    apply_to(datasource)
 
     # if we have a qualifier, traverse & apply by it
     if args.qualifier:
         retrieved = {}
 
-        for qualifier_arr in qualifier:
-            have_ret = dscer.retrieve_by_qualifier(datasources, qualifier_arr[0])
-            if have_ret:
-                retrieved[have_ret.name] = have_ret
+        # index the tree once, instead of traversing it from the top for every qualifier
+        qual_index = dscer.build_flat_index(datasources)
+
+        # -q is repeatable and takes a list, so flatten; qualifiers arrive already casefolded & split, so duplicates drop out here (order is kept)
+        unique_qs = list(
+            dict.fromkeys(
+                qual for qualifier_arr in qualifier for qual in qualifier_arr
+            )
+        )
+
+        for qual in unique_qs:
+            have_ret = qual_index.get(qual)
+
+            # distinct qualifiers can still resolve to the same node; keyed by identity, since names aren't unique across the tree
+            if not have_ret or id(have_ret) in retrieved:
+                continue
+
+            retrieved[id(have_ret)] = have_ret
+
+        for ret in retrieved.values():
+            apply_to(ret)
 
-        for name, ret in retrieved.items():
-            ret.apply(apply_fn)
+    # wait on every download, whether or not others failed; each failure is logged as it's found, and the run still records & processes what did come through before reporting it
+    failed = dscer.wait_for_all(pending)
 
-    else:
-        for name, datasource in datasources.items():
-            datasource.apply(apply_fn)
+    dscer.flush_manifests()
+
+    if to_process:
+        executor = dscer.get_executor()
+
+        failed += dscer.wait_for_all(
+            [(tv, executor.submit(tv.process)) for tv in to_process], action="process"
+        )
+
+    if failed:
+        logging.error(f"{len(failed)} item(s) failed; see the errors above")
 
     if bpt:
+        from pdb import set_trace as bp
+
         bp()
 
-    # run the download code
-    # param_path = "../params/landfire.json"
-    # param_path = "../params/nifc.json"
-    # param_path = "../params/uscb.json"
-    # with open(param_path) as df:
-    #     data_json = json.load(df)
-    #     # ds_spec = parse_datasource_spec(data_json["LANDFIRE"])
-    #     # ds_spec = parse_datasource_spec(data_json["NIFC"])
-    #     ds_spec = parse_datasource_spec(data_json["USCB"])
-    #     bp()
-    #     download_datasource("/home/max/dl_test/", ds_spec)
-    # bp()
+    return not failed
 
 
-def run():
+# qualifiers are case-insensitive and period-delimited; casefold & split them once, as the args are parsed
+def _qual(qualifier: str) -> Tuple[str, ...]:
+    return tuple(qualifier.casefold().split("."))
+
+
+# validates the datasource dir with a single stat as the args are parsed
+def _existing_dir(dir_path: str) -> Path:
+    try:
+        st = os.stat(dir_path)
+    except OSError:
+        st = None
+
+    if st is None or not stat.S_ISDIR(st.st_mode):
+        raise argparse.ArgumentTypeError(
+            f'Provided datasource directory does not exist or is not a directory: "{dir_path}"'
+        )
+
+    return Path(dir_path)
+
+
+def _build_parser() -> argparse.ArgumentParser:
 
     parser = argparse.ArgumentParser(
         description="CLI frontend for describing and downloading datasets."
@@ -140,7 +419,7 @@ def run():
         "--datasource_file",
         help=" [Optional] Specific datasource file to parse",
         dest="datasource_file",
-        type=str,
+        type=Path,
     )
 
     parser.add_argument(
@@ -184,9 +463,10 @@ def run():
     )
 
     parser.add_argument(
-        "-dsd" "--datasource_dir",
+        "-dsd",
+        "--datasource_dir",
         help="Directory of datasource files to parse (default: current directory). If qualifiers aren't provided, operations will be applied to all datasources in the given directory.",
-        type=str,
+        type=_existing_dir,
         default="./",
         dest="datasource_dir",
     )
@@ -213,7 +493,7 @@ def run():
         "-dd",
         "--data_directory",
         help="Destination directory for downloaded data",
-        type=str,
+        type=Path,
         required=True,
         dest="data_directory",
     )
@@ -222,6 +502,7 @@ def run():
         "-q",
         "--qualifier",
         help="Fully qualified identifier for a datasource/dataset/directory/file, case-insensitive and delimited by periods. Multiple qualifiers can be provided, either as a space-delimited list following the argument, or via separate individual arguments. If not provided, all input datasource files will be processed.",
+        type=_qual,
         nargs="*",
         action="append",
         dest="qualifier",
@@ -235,9 +516,19 @@ def run():
         dest="breakpt",
     )
 
-    args = parser.parse_args()
-    print(args)
-    process_args(args)
+    return parser
+
+
+# built once at import, rather than on every run()
+_PARSER = _build_parser()
+
+
+def run():
+
+    args = _PARSER.parse_args()
+
+    if not process_args(args):
+        sys.exit(1)
 
 
 if __name__ == "__main__":
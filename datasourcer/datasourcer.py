@@ -1,30 +1,93 @@
-import argparse
-import copy
-import ftplib
+import atexit
+import functools
+import hashlib
+import importlib
 import json
 import logging
-import math
 import os
-import pprint
-import sys
-import time
-from collections import deque, namedtuple
-from dataclasses import dataclass, field
-from datetime import datetime, timedelta
+import posixpath
+import shutil
+import tempfile
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import MISSING, dataclass, field, fields
+from datetime import datetime
 from enum import Enum
-from glob import glob
-from os.path import (abspath, basename, dirname, exists, getsize, isdir,
-                     isfile, join)
-from pathlib import Path
-from pdb import set_trace as bp
-from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+from os.path import basename, join
+from pathlib import Path, PurePosixPath
+from queue import Empty, SimpleQueue
+from types import MappingProxyType
+from typing import (TYPE_CHECKING, Any, Callable, Dict, FrozenSet, Iterable,
+                    List, Mapping, Optional, Sequence, Set, Tuple, Union)
 from urllib.parse import urlparse
-from zipfile import ZipFile
 
-import requests
+# requests (with everything it pulls in), ftplib & zipfile are only imported by the code paths that use them, so e.g. just parsing specs or printing CLI help doesn't pay for them
+if TYPE_CHECKING:
+    import ftplib
+    from zipfile import ZipFile, ZipInfo
+
+    import requests
 
 logging.basicConfig(level=logging.INFO)
 
+# local file paths; the download helpers work on plain strings internally, but take Paths too
+StrPath = Union[str, Path]
+
+
+# one session for every HTTP request, so requests to the same host reuse pooled (keep-alive) connections instead of paying for a new TCP/TLS handshake per file
+def _build_session() -> "requests.Session":
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    session = requests.Session()
+
+    # every download worker can hold a connection to the same host; a smaller pool would have urllib3 discard (and later re-open) connections at high fan-out
+    adapter = HTTPAdapter(
+        pool_connections=32,
+        pool_maxsize=max(64, download_workers()),
+        max_retries=Retry(total=3, backoff_factor=0.5),
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+    # ask for files unencoded by default, so Content-Length (from HEAD or GET) is the size of the file as it'll be on disk, and ranges line up with it
+    session.headers.update({"Accept-Encoding": "identity"})
+
+    return session
+
+
+_SESSION: Optional["requests.Session"] = None
+_SESSION_LOCK = threading.Lock()
+
+
+# the shared session, built on first use
+def get_session() -> "requests.Session":
+    global _SESSION
+
+    if _SESSION is None:
+        with _SESSION_LOCK:
+            if _SESSION is None:
+                _SESSION = _build_session()
+
+    return _SESSION
+
+# directories this process has already created (or found), so the many files going into the same directories don't each re-stat every path component
+_KNOWN_DIRS: Set[str] = set()
+
+
+def ensure_dir(dir_path: Path) -> None:
+    dir_key = os.fspath(dir_path)
+
+    if dir_key in _KNOWN_DIRS:
+        return
+
+    os.makedirs(dir_path, exist_ok=True)
+
+    # makedirs made sure of every ancestor too
+    _KNOWN_DIRS.add(dir_key)
+    _KNOWN_DIRS.update(os.fspath(parent) for parent in Path(dir_path).parents)
+
 # not a useful def here (though does carry useful semantics
 # class DatasetType(str, Enum):
 #     ARCHIVE="ARCHIVE",
@@ -36,13 +99,13 @@ logging.basicConfig(level=logging.INFO)
 class FileFormat(str, Enum):
 
     # zipfiles will have a corresponding 'unzip' attribute, specifying the decompressed directory name
-    ZIP = ("ZIP",)
-    CSV = ("CSV",)
-    GEOJSON = ("GEOJSON",)
-    JSON = ("JSON",)
-    ARCGRID = ("ARCGRID",)
-    SHAPEFILE = ("SHAPEFILE",)
-    KML = ("KML",)
+    ZIP = "ZIP"
+    CSV = "CSV"
+    GEOJSON = "GEOJSON"
+    JSON = "JSON"
+    ARCGRID = "ARCGRID"
+    SHAPEFILE = "SHAPEFILE"
+    KML = "KML"
 
 
 class FileFormatProcessor:
@@ -50,20 +113,86 @@ class FileFormatProcessor:
         return False
 
 
+# copy buffer size used when extracting zip entries
+UNZIP_BUFFER_SIZE = 1 << 20
+
+# archives with less uncompressed data than this are extracted on a single thread
+PARALLEL_UNZIP_MIN_BYTES = 256 << 20
+
+
+# entries are streamed to disk through a fixed-size buffer, so memory use doesn't grow with the size of the entries
+def extract_zip_entry(zf: "ZipFile", info: "ZipInfo", target: Path) -> None:
+    with zf.open(info) as src, open(target, "wb") as dst:
+        shutil.copyfileobj(src, dst, UNZIP_BUFFER_SIZE)
+
+
 @dataclass
 class ZipfileProcessor(FileFormatProcessor):
     unzip_dir: Path
 
     def process(self, resource: "StaticResource") -> bool:
+        from zipfile import ZipFile
+
         success = True
 
-        zf_path = resource.path
+        zf_path = resource.build_path()
         out_path = resource.build_parent_path() / self.unzip_dir
+        out_root = out_path.resolve()
 
         try:
-            with open(zf_path, "rb") as zf_bin:
-                zf = ZipFile(zf_bin)
-                zf.extractall(path=out_path)
+            to_extract = []
+
+            with open(zf_path, "rb") as zf_bin, ZipFile(zf_bin) as zf:
+                for info in zf.infolist():
+                    target = (out_root / info.filename).resolve()
+
+                    # don't let entry names (e.g. "../x" or absolute paths) write outside of the unzip dir
+                    if target != out_root and out_root not in target.parents:
+                        logging.error(
+                            f'Skipping zip entry outside of the unzip dir: "{info.filename}"'
+                        )
+                        success = False
+                        continue
+
+                    if info.is_dir():
+                        ensure_dir(target)
+                        continue
+
+                    ensure_dir(target.parent)
+                    to_extract.append((info, target))
+
+                total_size = sum(info.file_size for info, _ in to_extract)
+
+                # not worth spinning up workers (each re-opening the archive) for small archives
+                if len(to_extract) < 2 or total_size < PARALLEL_UNZIP_MIN_BYTES:
+                    for info, target in to_extract:
+                        extract_zip_entry(zf, info, target)
+
+                    return success
+
+            # zlib releases the GIL while inflating, so large archives are extracted by several threads at once; each has its own handle on the archive, as a ZipFile can't be read from concurrently. Largest entries first, so one big entry doesn't end up starting last
+            pending: SimpleQueue = SimpleQueue()
+
+            for entry in sorted(to_extract, key=lambda e: e[0].file_size, reverse=True):
+                pending.put(entry)
+
+            def unzip_worker():
+                with ZipFile(zf_path) as worker_zf:
+                    while True:
+                        try:
+                            info, target = pending.get_nowait()
+                        except Empty:
+                            return
+
+                        extract_zip_entry(worker_zf, info, target)
+
+            num_workers = min(os.cpu_count() or 1, len(to_extract))
+
+            with ThreadPoolExecutor(max_workers=num_workers) as executor:
+                futures = [executor.submit(unzip_worker) for _ in range(num_workers)]
+
+                for future in futures:
+                    future.result()
 
         except Exception as e:
             print(f"Failed to unzip {resource} using {self}")
@@ -72,63 +201,70 @@ class ZipfileProcessor(FileFormatProcessor):
         return success
 
 
-FileFormatToExtensionMap: Dict[FileFormat, str] = {
-    FileFormat.ZIP: "zip",
-    FileFormat.CSV: "csv",
-    FileFormat.GEOJSON: "geo.json",
-    FileFormat.JSON: "json",
-    FileFormat.ARCGRID: "grid",
-    FileFormat.SHAPEFILE: "shp",
-    FileFormat.KML: "kml",
-}
+# read-only, as they're shared module-wide
+FileFormatToExtensionMap: Mapping[FileFormat, str] = MappingProxyType(
+    {
+        FileFormat.ZIP: "zip",
+        FileFormat.CSV: "csv",
+        FileFormat.GEOJSON: "geo.json",
+        FileFormat.JSON: "json",
+        FileFormat.ARCGRID: "grid",
+        FileFormat.SHAPEFILE: "shp",
+        FileFormat.KML: "kml",
+    }
+)
 
 
 # map of file formats to available processors
-FileFormatToProcessorMap: Dict[FileFormat, Optional[FileFormatProcessor]] = {
-    FileFormat.ZIP: ZipfileProcessor,
-    FileFormat.CSV: None,
-    FileFormat.GEOJSON: None,
-    FileFormat.JSON: None,
-    FileFormat.ARCGRID: None,
-    FileFormat.SHAPEFILE: None,
-    FileFormat.KML: None,
-}
+FileFormatToProcessorMap: Mapping[
+    FileFormat, Optional[FileFormatProcessor]
+] = MappingProxyType(
+    {
+        FileFormat.ZIP: ZipfileProcessor,
+        FileFormat.CSV: None,
+        FileFormat.GEOJSON: None,
+        FileFormat.JSON: None,
+        FileFormat.ARCGRID: None,
+        FileFormat.SHAPEFILE: None,
+        FileFormat.KML: None,
+    }
+)
 
 
 # file retrieval method
 class RetrieveType(str, Enum):
 
     # standard GET request; source is a url (files only)
-    GET = ("GET",)
+    GET = "GET"
 
     # FTP server request; source is an ftp url (directories or files)
-    FTP = ("FTP",)
+    FTP = "FTP"
 
-    # manually-populated (i.e. "by hand") data or directory (e.g. for an unscriptable archive source)
-    MANUAL = ("MANUAL",)
+    # manually-populated (i.e. "by hand") data or directory (e.g. for an unscriptable archive source); downloading one is a no-op that succeeds, for files and remote directories alike
+    MANUAL = "MANUAL"
 
     # not retrieved; instead, created as part of the defined hierarchy (for directories; files will always be retrieved)
-    NONE = ("NONE",)
+    NONE = "NONE"
 
 
 # object lifecycle or creation scope; different creation scopes will be retrieved in different contexts
 class CreateType(str, Enum):
 
     # statically-created, should always exist, & will be retrieved in a static data pull
-    STATIC = ("STATIC",)
+    STATIC = "STATIC"
 
     # generated in some way, typically for live data sources (& typically is templated, e.g. via datetime); will not be retrieved in a static data pull, should be handled in a cron-style ETL stage instead
-    DYNAMIC = ("DYNAMIC",)
+    DYNAMIC = "DYNAMIC"
 
 
 # for figuring out directory types when unmarshalling JSON
 class DirectoryType(str, Enum):
 
     # locally-created directory
-    LOCAL = ("LOCAL",)
+    LOCAL = "LOCAL"
 
     # directory retrieved from elsewhere (e.g. via FTP)
-    REMOTE = ("REMOTE",)
+    REMOTE = "REMOTE"
 
 
 class ResourceType(str, Enum):
@@ -149,29 +285,113 @@ class ResourceType(str, Enum):
 #     FILE,
 
 
+# capability flags; each tree class sets _CAPS to the ones it supports, so callers can check a node's capabilities with a single attribute lookup rather than a chain of isinstance checks
+CAP_DOWNLOAD = 1
+CAP_PROCESS = 2
+CAP_DYNAMIC = 4
+CAP_REMOTE_SUBSET = 8
+
+
+# the mixins declare no instance attributes of their own (empty __slots__), so slotted subclasses don't get a __dict__ through them; Traversable's slots are the per-node caches below, which aren't dataclass fields & stay unset until first use
 class Traversable:
+    __slots__ = ("_cached_path", "_has_retrievable", "_folded")
+
+    _CAPS = 0
+
+    # dataclass fields holding per-run state, which are reset to their defaults in pickles (e.g. the CLI's parse cache)
+    _TRANSIENT_FIELDS: FrozenSet[str] = frozenset()
+
+    # state is given as slot state, as there's no __dict__; the caches above are left out (so they're worked out again after unpickling), as are transient fields' values
+    def __getstate__(self):
+        state = {}
+
+        for f in fields(self):
+            if f.name in self._TRANSIENT_FIELDS:
+                state[f.name] = f.default
+                continue
+
+            try:
+                state[f.name] = getattr(self, f.name)
+            except AttributeError:
+                # not set (yet)
+                pass
+
+        return (None, state)
+
+    # resolves the remaining qualifier parts below this node; kept for callers that still hold a traversal stack
     def traverse(
-        self, traverse_stack: deque, match_case: bool = False
+        self, traverse_stack: Sequence[str], match_case: bool = False
     ) -> Optional["DatasetType"]:
-        pass
+        return resolve_parts(self, tuple(traverse_stack), match_case=match_case)
 
     def get_traversable_children(self):
         pass
 
+    # children reachable by the next part of a qualifier, by name; later groups take precedence on name collisions, mirroring traverse()
+    def get_addressable_children(self) -> Dict[str, "Traversable"]:
+        return {}
+
+    # pre-order walk over the tree, calling fn on every node; iterative (children are pushed in reverse so they're still visited in order), so deep trees don't pay for a frame per level or run into the recursion limit
     def apply(self, fn: Callable, depth=0):
-        fn(self, depth=depth)
+        stack = [(self, depth)]
+
+        while stack:
+            node, node_depth = stack.pop()
+            fn(node, depth=node_depth)
 
-        for child in self.get_traversable_children():
-            child.apply(fn, depth=depth + 1)
+            stack.extend(
+                (child, node_depth + 1)
+                for child in reversed(node.get_traversable_children())
+            )
 
     def build_parent_path(self) -> Path:
-        pass
+        return self.parent.build_path()
 
+    # the tree isn't restructured after parsing, so each node's path only needs working out once
     def build_path(self) -> Path:
-        pass
+        try:
+            return self._cached_path
+        except AttributeError:
+            self._cached_path = self.build_parent_path() / self.path
+            return self._cached_path
+
+    # whether anything under this node can actually be retrieved; worked out bottom-up on first use & kept (the tree isn't restructured after parsing), so downloads can skip layout-only subtrees without walking them
+    def has_retrievable(self) -> bool:
+        try:
+            return self._has_retrievable
+        except AttributeError:
+            self._has_retrievable = any(
+                child.has_retrievable() for child in self.get_traversable_children()
+            )
+            return self._has_retrievable
+
+    # casefolded index over one of the node's child dicts (by attribute name), for case-insensitive lookups; built on first use, as the child dicts are filled in after the node is constructed
+    def folded_children(self, attr: str) -> Dict[str, Any]:
+        try:
+            folded = self._folded
+        except AttributeError:
+            folded = self._folded = {}
+
+        index = folded.get(attr)
+
+        if index is None:
+            index = folded[attr] = casefold_index(getattr(self, attr))
+
+        return index
+
+    # looks up a child by name in one of the node's child dicts; case-insensitive lookups are a single get on the (cached) casefolded index
+    def lookup_child(
+        self, attr: str, key: str, match_case: bool = False
+    ) -> Optional["Traversable"]:
+        if match_case:
+            return getattr(self, attr).get(key)
+
+        return self.folded_children(attr).get(key.casefold())
 
 
 class Downloadable:
+    __slots__ = ()
+
     def can_download(self) -> bool:
         pass
 
@@ -187,6 +407,8 @@ class Downloadable:
 
 
 class Processable:
+    __slots__ = ()
+
     def can_process(self) -> bool:
         pass
 
@@ -198,25 +420,71 @@ class TemplateType(str, Enum):
     DATETIME = "DATETIME"
 
 
+def casefold_index(d: Dict[str, Any]) -> Dict[str, Any]:
+    return {k.casefold(): v for k, v in d.items()}
+
+
+# one-off lookup in a plain dict; nodes' child dicts go through Traversable.lookup_child(), which keeps its casefolded index around
 def check_dict(key: str, d: Dict[str, Any], match_case: bool = False) -> Optional[Any]:
-    dict_set = {k.lower() if not match_case else k: k for k in d}
+    if match_case:
+        return d.get(key)
+
+    return casefold_index(d).get(key.casefold())
+
+
+# dataclass(slots=True) is 3.10+, so this rebuilds a dataclass with __slots__ for the fields it adds (inherited ones already have theirs); instances then carry no __dict__, which adds up over trees with thousands of nodes. Apply it above @dataclass
+def with_slots(cls):
+    inherited = set()
 
-    check = dict_set.get(key.lower() if not match_case else key)
+    for base in cls.__mro__[1:]:
+        inherited.update(getattr(base, "__slots__", ()))
 
-    if check is not None:
-        return d.get(check)
+    slot_names = tuple(f.name for f in fields(cls) if f.name not in inherited)
 
-    return None
+    cls_dict = dict(cls.__dict__)
+    cls_dict["__slots__"] = slot_names
 
+    # field defaults live on in the generated __init__; as class attributes, they'd clash with the slots
+    for name in slot_names:
+        cls_dict.pop(name, None)
 
+    cls_dict.pop("__dict__", None)
+    cls_dict.pop("__weakref__", None)
+
+    # the generated __init__ leaves init=False fields to those class attributes too, so set their defaults up front
+    init_defaults = tuple(
+        (f.name, f.default)
+        for f in fields(cls)
+        if not f.init and f.default is not MISSING
+    )
+
+    if init_defaults:
+        dataclass_init = cls.__init__
+
+        @functools.wraps(dataclass_init)
+        def __init__(self, *args, **kwargs):
+            for name, default in init_defaults:
+                setattr(self, name, default)
+
+            dataclass_init(self, *args, **kwargs)
+
+        cls_dict["__init__"] = __init__
+
+    return type(cls)(cls.__name__, cls.__bases__, cls_dict)
+
+
+@with_slots
 @dataclass
 class DataContext:
     root_path: Path
 
 
 # these dataclass definitions also define the layout of the input datasource JSON files
+@with_slots
 @dataclass
 class Resource(Traversable, Downloadable, Processable):
+    _CAPS = CAP_DOWNLOAD | CAP_PROCESS
+
     name: str
     file_type: FileFormat
     retrieve_type: RetrieveType
@@ -229,26 +497,50 @@ class Resource(Traversable, Downloadable, Processable):
 
     parent: "Subset"
 
+    # HEAD results, for the current run only (see fetch_remote_size()); the remote size can change between runs
+    _TRANSIENT_FIELDS = frozenset(("_remote_checked", "_remote_size", "_accepts_ranges"))
+
+    _remote_checked: bool = field(
+        default=False, init=False, repr=False, compare=False
+    )
+    _remote_size: Optional[int] = field(
+        default=None, init=False, repr=False, compare=False
+    )
+    _accepts_ranges: bool = field(
+        default=False, init=False, repr=False, compare=False
+    )
+
+    # expected "<algorithm>:<hex digest>" of the file, if the spec gives one (see check_file_hash())
+    checksum: Optional[str] = field(default=None, init=False, repr=False)
+
+    # kept to a line (no parent / processor), as nodes end up in log messages
     def __repr__(self):
-        return f'StaticResource("{self.name}", source: {self.source})'
+        return f'{type(self).__name__}("{self.name}", source: {self.source})'
 
-    # No traversal precedence (no nested structures here)
-    # TODO shouldn't be traversing past a file; if traverse_stack stil has elements, return error
-    def traverse(
-        self, traverse_stack: deque, match_case: bool = False
-    ) -> Optional["DatasetType"]:
-        return self
+    # size of the file at the source, if the server reports it; requested once & kept, so a batch of these can be fetched ahead of the downloads (see prefetch_remote_sizes())
+    def fetch_remote_size(self, level: int = 0) -> Optional[int]:
+        if not self._remote_checked:
+            # the session asks for no compression, so content-length is the size of the file as it'll be on disk
+            head = get_session().head(self.source, allow_redirects=True)
 
-    def build_parent_path(self) -> Path:
-        return self.parent.build_path()
+            # an error page's headers say nothing about the file, so its size stays unknown
+            if head.ok:
+                self._remote_size = get_filesize_from_headers(head.headers, level=level)
+                self._accepts_ranges = head.headers.get("Accept-Ranges") == "bytes"
+            else:
+                level_info(f"HEAD request failed ({head.status_code}); size is unknown", level)
 
-    def build_path(self) -> Path:
-        return self.build_parent_path() / self.path
+            self._remote_checked = True
+
+        return self._remote_size
 
     def get_traversable_children(self):
         # resource has no traversable children (should it even be considered traversable?)
         return []
 
+    def has_retrievable(self) -> bool:
+        return self.retrieve_type != RetrieveType.NONE and bool(self.can_download())
+
     def can_download(self) -> bool:
         # a place to download from, a download method, and a place to put the download
         return (
@@ -264,6 +556,7 @@ class Resource(Traversable, Downloadable, Processable):
         validate_existing: bool = True,
         reload_unconfirmable: bool = False,
         name: Optional[Path] = None,
+        dir_listing: Optional[Dict[str, int]] = None,
     ) -> bool:
 
         # handle default case for no-override filename
@@ -274,66 +567,175 @@ class Resource(Traversable, Downloadable, Processable):
         if parent_dir is None:
             parent_dir = self.build_parent_path()
 
-        level_info('Downloading file "{}"'.format(name), level)
+        level_info(f'Downloading file "{name}"', level)
 
-        if self.retrieve_type == RetrieveType.GET:
-            level_info("GET {}".format(self.source), level)
+        handler = self._DOWNLOAD_HANDLERS.get(self.retrieve_type)
 
-            if self.source is None or len(self.source) == 0:
-                level_info("No source specified; skipping file spec", level)
-                return False
+        if handler is None:
+            # catch-all false, retrieve_type not handled
+            level_info(f'Retrieve type not handled ("{self.retrieve_type}")', level)
+            return False
 
-            # make the directories leading up to this file, if they don't already exist
-            os.makedirs(parent_dir, exist_ok=True)
+        return handler(
+            self,
+            parent_dir,
+            name,
+            level=level,
+            validate_existing=validate_existing,
+            reload_unconfirmable=reload_unconfirmable,
+            dir_listing=dir_listing,
+        )
 
-            file_path = Path(join(parent_dir, name))
+    def _download_get(
+        self,
+        parent_dir: Path,
+        name: Path,
+        level: int = 0,
+        validate_existing: bool = True,
+        reload_unconfirmable: bool = False,
+        dir_listing: Optional[Dict[str, int]] = None,
+    ) -> bool:
+        level_info(f"GET {self.source}", level)
 
-            # request the headers here, with the accepted compression to be 'none' (so that chunking size lines up with content-length here)
-            head = requests.head(
-                self.source, stream=True, headers={"Accept-Encoding": "identity"}
-            )
+        if self.source is None or len(self.source) == 0:
+            level_info("No source specified; skipping file spec", level)
+            return False
 
-            # check if the file already exists
-            if validate_existing:
+        # make the directories leading up to this file, if they don't already exist
+        ensure_dir(parent_dir)
 
-                # TODO
-                filesize_remote = None
+        # plain strings from here on; open(), os.stat() & co. take them as-is, so there's no Path to build (and normalize) per file
+        file_path = join(parent_dir, name)
+        file_name = basename(file_path)
+        resume_from = 0
+        if_range = None
 
-                (exists, is_valid) = validate_file(
-                    file_path, remote_filesize=filesize_remote, level=level
-                )
+        # check if the file already exists
+        manifest = get_manifest(parent_dir)
 
-                do_download = check_validation_policy(
-                    exists,
-                    is_valid,
-                    level=level,
-                    reload_unconfirmable=reload_unconfirmable,
+        if validate_existing:
+            # a file that hasn't changed since it was last downloaded (or validated) from this same source needs neither a HEAD nor a re-hash
+            if manifest.is_unchanged(file_path, self.source, self.checksum):
+                level_info(
+                    "File unchanged since its last validated retrieve; skipping download",
+                    level,
                 )
+                return True
+
+            # without a listing of the dir, stat the file once here; validation & resuming below both work off the result
+            if dir_listing is None:
+                local_size = local_file_size(file_path)
+                dir_listing = {} if local_size is None else {file_name: local_size}
+
+            # no local file means nothing to compare against, so don't spend a HEAD round-trip on it
+            have_local = file_name in dir_listing
+            filesize_remote = self.fetch_remote_size(level=level) if have_local else None
+
+            (exists, is_valid) = validate_file(
+                file_path,
+                remote_filesize=filesize_remote,
+                file_hash=self.checksum,
+                level=level,
+                dir_listing=dir_listing,
+            )
 
-                if not do_download:
-                    if exists:
-                        return True
-                    else:
-                        return False
+            do_download = check_validation_policy(
+                exists,
+                is_valid,
+                level=level,
+                reload_unconfirmable=reload_unconfirmable,
+            )
+
+            if not do_download:
+                if exists and is_valid:
+                    manifest.record(file_path, self.source, self.checksum)
+
+                if exists:
+                    return True
+                else:
+                    return False
+
+            # a local file smaller than the remote one is most likely an interrupted download; if the server supports ranges, only fetch the rest
+            if (
+                exists
+                and is_valid is False
+                and self._accepts_ranges
+                and filesize_remote is not None
+            ):
+                local_size = dir_listing[file_name]
+
+                # resuming is only safe from the version of the file the partial one came from; the manifest has its validator if the download was started by us
+                if_range = manifest.resume_validator(file_path, self.source)
+
+                if local_size < filesize_remote and if_range is not None:
+                    resume_from = local_size
+
+        level_info(f"Into {file_path}", level)
+
+        # request the file here; we're going to look at the Content-Length header size and want some fine-grained control over how we download this (e.g. for logging purposes), so enable streaming
+        # the version being written is noted before any of it is, so an interrupted download can be resumed against it next time
+        def note_partial(headers: "requests.structures.CaseInsensitiveDict") -> None:
+            manifest.begin(
+                file_path,
+                self.source,
+                etag=headers.get("ETag"),
+                last_modified=headers.get("Last-Modified"),
+            )
+
+        resp_headers = get_chunked(
+            self.source,
+            file_path,
+            level=level,
+            resume_from=resume_from,
+            if_range=if_range,
+            on_response=note_partial,
+        )
 
-            level_info("Into {}".format(file_path), level)
+        if resp_headers is None:
+            return False
 
-            # request the file here; we're going to look at the Content-Length header size and want some fine-grained control over how we download this (e.g. for logging purposes), so enable streaming
-            get_chunked(self.source, Path(file_path), level=level)
+        # only a file that came through whole (& matches the spec's checksum, if it gives one) goes in the manifest; anything else gets looked at again next run
+        if (
+            self.checksum is not None
+            and check_file_hash(file_path, self.checksum) is False
+        ):
+            level_error(f"Checksum mismatch for downloaded file {file_path}", level)
+            return False
 
-            return True
+        manifest.record(
+            file_path,
+            self.source,
+            self.checksum,
+            etag=resp_headers.get("ETag"),
+            last_modified=resp_headers.get("Last-Modified"),
+        )
 
-        elif self.retrieve_type == RetrieveType.FTP:
-            level_info("FTP {}".format(self.source), level)
-        if self.retrieve_type == RetrieveType.MANUAL:
-            level_info("Manual (no-op)", level)
+        return True
 
-        # catch-all false, retrieve_type not handled
-        level_info('Retrieve type not handled ("{}")'.format(self.retrieve_type), level)
+    def _download_ftp(
+        self, parent_dir: Path, name: Path, level: int = 0, **kwargs
+    ) -> bool:
+        level_info(f"FTP {self.source}", level)
+        level_info("FTP retrieval isn't supported for single files", level)
         return False
 
+    def _download_manual(
+        self, parent_dir: Path, name: Path, level: int = 0, **kwargs
+    ) -> bool:
+        # put in place by hand; nothing to retrieve (see RetrieveType.MANUAL)
+        level_info("Manual (no-op)", level)
+        return True
 
-@dataclass
+    # retrieve type -> download implementation; looked up once per download, rather than comparing against each retrieve type in turn
+    _DOWNLOAD_HANDLERS = {
+        RetrieveType.GET: _download_get,
+        RetrieveType.FTP: _download_ftp,
+        RetrieveType.MANUAL: _download_manual,
+    }
+
+
+@with_slots
+@dataclass(repr=False)
 class StaticResource(Resource):
     name: str
     path: Path
@@ -342,8 +744,11 @@ class StaticResource(Resource):
 Snapshot = Tuple[datetime, Path]
 
 
-@dataclass
+@with_slots
+@dataclass(repr=False)
 class DynamicResource(Resource):
+    _CAPS = CAP_DOWNLOAD | CAP_PROCESS | CAP_DYNAMIC
+
     extension: str
 
     # information about the resource
@@ -351,9 +756,6 @@ class DynamicResource(Resource):
 
     date_fmt: str = "%Y_%m_%d_%H%M"
 
-    def __repr__(self):
-        return f'DynamicResource("{self.name}", source: {self.source})'
-
     def __post_init__(self):
         self.update_snapshots()
 
@@ -365,6 +767,9 @@ class DynamicResource(Resource):
 
         this_path = self.build_parent_path()
 
+        # os.walk yields nothing for a directory that doesn't exist (yet); that's no snapshots, not an error
+        snapshots: List[Snapshot] = []
+
         for root, dirs, files in os.walk(scan_dir):
             snapshots = [
                 (parse_datetime(filename), this_path / Path(filename))
@@ -419,8 +824,11 @@ class DynamicResource(Resource):
         return None
 
 
+@with_slots
 @dataclass
 class Subset(Traversable, Processable):
+    _CAPS = CAP_PROCESS
+
     name: str
     path: Path
     create_type: CreateType
@@ -429,44 +837,7 @@ class Subset(Traversable, Processable):
     parent: Union["Dataset", "Subset"]
 
     def __repr__(self):
-        return f'Subset("{self.name}", Subsets: {list(self.subsets.keys())}, Resources: {list(self.resources.keys())})'
-
-    def build_parent_path(self) -> Path:
-        return self.parent.build_path()
-
-    def build_path(self) -> Path:
-        return self.build_parent_path() / self.path
-
-    # Files first
-    def traverse(
-        self, traverse_stack: deque, match_case: bool = False
-    ) -> Optional["DatasetType"]:
-
-        # base case; nothing left in the traversal stack, so this is (hopefully) what we were looking for
-        if len(traverse_stack) == 0:
-            return self
-
-        target = traverse_stack.popleft()
-
-        have_file = check_dict(target, self.resources, match_case=match_case)
-
-        # files can't traverse, so don't try (and if there's still something left in the traverse stack, skip it)
-        if have_file and len(traverse_stack) == 0:
-            return have_file
-
-        elif have_file and len(traverse_stack) > 0:
-            # don't try to traverse a file; fail safely and make the user specify
-            logging.error(
-                f"Can't traverse a file ({have_file}), attempting: {traverse_stack}."
-            )
-            return None
-
-        have_dir = check_dict(target, self.subsets, match_case=match_case)
-
-        if have_dir:
-            return have_dir.traverse(traverse_stack, match_case=match_case)
-
-        return None
+        return f'Subset("{self.name}", Subsets: {len(self.subsets)}, Resources: {len(self.resources)})'
 
     def get_traversable_children(self) -> List[Traversable]:
         children: List[Traversable] = []
@@ -479,6 +850,10 @@ class Subset(Traversable, Processable):
 
         return children
 
+    def get_addressable_children(self) -> Dict[str, Traversable]:
+        # files first
+        return {**self.subsets, **self.resources}
+
     def get_resource_by_index(self, index: int) -> Optional[Resource]:
         filenames = list(self.resources.keys())
 
@@ -497,37 +872,29 @@ class Subset(Traversable, Processable):
         return obj
 
 
+@with_slots
 @dataclass
 class RemoteSubset(Subset, Downloadable):
+    _CAPS = CAP_DOWNLOAD | CAP_PROCESS | CAP_REMOTE_SUBSET
+
     name: str
     path: Path
     retrieve_type: RetrieveType
     source: str
 
     def __repr__(self):
-        return f'RemoteSubset("{self.name}", source: self.source)'
-
-    def build_parent_path(self) -> Path:
-        return self.parent.build_path()
-
-    def build_path(self) -> Path:
-        return self.build_parent_path() / self.path
-
-    def traverse(
-        self, traverse_stack: deque, match_case: bool = False
-    ) -> Optional["DatasetType"]:
-
-        # base case; nothing left in the traversal stack, so this is (hopefully) what we were looking for
-        if len(traverse_stack) == 0:
-            return self
-        else:
-            # can't (yet) request a subfile for a remote directory
-            return None
+        return f'RemoteSubset("{self.name}", source: {self.source})'
 
     def get_traversable_children(self) -> List[Traversable]:
         # remote subset has no children, as it's self-contained
         return []
 
+    def has_retrievable(self) -> bool:
+        return self.retrieve_type != RetrieveType.NONE
+
+    def get_addressable_children(self) -> Dict[str, Traversable]:
+        return {}
+
     def can_download(self) -> bool:
         # TODO some remote logic e.g. checking FTP server for existence of this resource / subset?
         return True
@@ -539,7 +906,7 @@ class RemoteSubset(Subset, Downloadable):
         validate_existing: bool = True,
         reload_unconfirmable: bool = True,
         name: Optional[Path] = None,
-    ) -> None:
+    ) -> bool:
         # download_remote_directory(dir_path, directory, level=level)
         # def download_remote_directory(
         #     parent_dir: Path,
@@ -552,68 +919,129 @@ class RemoteSubset(Subset, Downloadable):
         if parent_dir is None:
             parent_dir = self.build_path()
 
-        if self.retrieve_type == RetrieveType.GET:
-            level_error("Retrieve type GET not impl.; object: {}".format(self), level)
+        handler = self._DOWNLOAD_HANDLERS.get(self.retrieve_type)
 
-        elif self.retrieve_type == RetrieveType.FTP:
-            url = urlparse(self.source)
-            level_info(
-                "Retrieving directory at {} from path {} into {}".format(
-                    url.netloc, url.path, parent_dir
-                ),
-                level,
-            )
+        if handler is None:
+            level_error(f"Retrieve type unmatched; object: {self}", level)
+            return False
 
-            os.makedirs(parent_dir, exist_ok=True)
+        return handler(
+            self,
+            parent_dir,
+            level=level,
+            validate_existing=validate_existing,
+            reload_unconfirmable=reload_unconfirmable,
+        )
 
-            with ftplib.FTP(host=url.netloc) as ftp:
-                ftp.login()
-                level_info("FTP connection successful", level)
-                remote_files = ftp.nlst(url.path)
+    def _download_get(self, parent_dir: Path, level: int = 0, **kwargs) -> bool:
+        level_error(f"Retrieve type GET not impl.; object: {self}", level)
+        return False
 
-                for remote_file in remote_files:
-                    remote_path = Path(remote_file)
-                    file_path = Path(join(parent_dir, remote_path.name))
+    def _download_ftp(
+        self,
+        parent_dir: Path,
+        level: int = 0,
+        validate_existing: bool = True,
+        reload_unconfirmable: bool = True,
+    ) -> bool:
+        import ftplib
 
-                    level_info("Downloading {}...".format(remote_path.name), level)
+        url = urlparse(self.source)
+        level_info(
+            f"Retrieving directory at {url.netloc} from path {url.path} into {parent_dir}",
+            level,
+        )
 
-                    if validate_existing:
-                        remote_size = ftp.size(remote_file)
+        ensure_dir(parent_dir)
 
-                        (exists, is_valid) = validate_file(
-                            file_path, remote_filesize=remote_size, level=level
-                        )
+        with ftplib.FTP(host=url.netloc) as ftp:
+            ftp.login()
+            level_info("FTP connection successful", level)
 
-                        do_download = check_validation_policy(
-                            exists,
-                            is_valid,
-                            level=level,
-                            reload_unconfirmable=reload_unconfirmable,
-                        )
+            remote_entries = ftp_list_files(ftp, url.path, level=level)
+
+        pending: SimpleQueue = SimpleQueue()
+
+        # everything lands in the same dir, so list it once for validation rather than stat'ing each file
+        dir_listing = scan_dir_sizes(parent_dir) if validate_existing else None
+
+        for remote_file, remote_size in remote_entries:
+            remote_path = PurePosixPath(remote_file)
+            file_path = join(parent_dir, remote_path.name)
+
+            level_info(f"Downloading {remote_path.name}...", level)
+
+            if validate_existing:
+                (exists, is_valid) = validate_file(
+                    file_path,
+                    remote_filesize=int(remote_size) if remote_size is not None else None,
+                    level=level,
+                    dir_listing=dir_listing,
+                )
+
+                do_download = check_validation_policy(
+                    exists,
+                    is_valid,
+                    level=level,
+                    reload_unconfirmable=reload_unconfirmable,
+                )
 
-                        if not do_download:
-                            continue
+                if not do_download:
+                    continue
+
+            pending.put((remote_path, file_path))
+
+        # an FTP connection only carries one transfer at a time, so each worker logs in on its own connection and works through the queue
+        def ftp_worker():
+            with ftplib.FTP(host=url.netloc) as worker_ftp:
+                worker_ftp.login()
+
+                while True:
+                    try:
+                        remote_path, file_path = pending.get_nowait()
+                    except Empty:
+                        return
 
-                    with open(file_path, "wb") as ftp_file:
-                        ftp.retrbinary("RETR {}".format(remote_file), ftp_file.write)
+                    written = ftp_retrieve_file(worker_ftp, remote_path, file_path)
 
                     level_info(
-                        "Finished downloading {} (size {})".format(
-                            remote_path.name, convert_size(getsize(file_path))
-                        ),
+                        f"Finished downloading {remote_path.name} (size {convert_size(written)})",
                         level,
                     )
 
-        elif self.retrieve_type == RetrieveType.MANUAL:
-            level_error("Retrieve type MANUAL no-op; object: {}".format(self), level)
-        elif self.retrieve_type == RetrieveType.NONE:
-            level_error("Retrieve type NONE no-op.; object: {}".format(self), level)
-        else:
-            level_error("Retrieve type unmatched; object: {}".format(self), level)
+        num_workers = min(FTP_WORKERS, pending.qsize())
+
+        if num_workers > 0:
+            with ThreadPoolExecutor(max_workers=num_workers) as executor:
+                futures = [executor.submit(ftp_worker) for _ in range(num_workers)]
 
+                for future in futures:
+                    future.result()
+
+        return True
 
+    def _download_manual(self, parent_dir: Path, level: int = 0, **kwargs) -> bool:
+        # put in place by hand; nothing to retrieve (see RetrieveType.MANUAL)
+        level_info("Manual (no-op)", level)
+        return True
+
+    def _download_none(self, parent_dir: Path, level: int = 0, **kwargs) -> bool:
+        level_error(f"Retrieve type NONE no-op.; object: {self}", level)
+        return False
+
+    _DOWNLOAD_HANDLERS = {
+        RetrieveType.GET: _download_get,
+        RetrieveType.FTP: _download_ftp,
+        RetrieveType.MANUAL: _download_manual,
+        RetrieveType.NONE: _download_none,
+    }
+
+
+@with_slots
 @dataclass
 class Dataset(Traversable, Downloadable, Processable):
+    _CAPS = CAP_DOWNLOAD | CAP_PROCESS
+
     name: str
     path: Path
     description: Optional[str]
@@ -622,25 +1050,19 @@ class Dataset(Traversable, Downloadable, Processable):
     parent: "Datasource"
 
     def __repr__(self):
-        return f'Dataset("{self.name}", Org: {self.org})'
-
-    def build_parent_path(self) -> Path:
-        return self.parent.build_path()
-
-    def build_path(self) -> Path:
-        return self.build_parent_path() / self.path
-
-    def traverse(
-        self, traverse_stack: deque, match_case: bool = False
-    ) -> Optional["DatasetType"]:
-
-        # forward the traversal to the (org)anization of the dataset (i.e. the dir)
-        return self.org.traverse(traverse_stack, match_case=match_case)
+        return f'Dataset("{self.name}", Org: "{self.org.name if self.org is not None else None}")'
 
     def get_traversable_children(self) -> List[Traversable]:
         # only 1 traversable child; the org subset
         return [self.org]
 
+    def get_addressable_children(self) -> Dict[str, Traversable]:
+        # qualifiers address the org subset's contents directly, as in traverse()
+        if self.org is None:
+            return {}
+
+        return self.org.get_addressable_children()
+
     def download(
         self,
         parent_dir: Optional[Path] = None,
@@ -648,29 +1070,23 @@ class Dataset(Traversable, Downloadable, Processable):
         validate_existing: bool = True,
         reload_unconfirmable: bool = True,
         name: Optional[Path] = None,
-    ):
-        # def download_dataset(parent_dir: Path, dataset: Dataset, level: int = 1):
-
-        logging.info('{}Downloading dataset "{}"'.format("\t" * level, self.name))
-
-        # used to use the dataset name as a directory name directly, but instead this is specified in the org dir
-        # dir_path = join(parent_dir, dataset.name)
-        if parent_dir is None:
-            parent_dir = self.build_parent_path()
-
-        dir_path = parent_dir
+    ) -> bool:
+        level_info(f'Downloading dataset "{self.name}"', level)
 
-        # download_directory(dir_path, dataset.org, level=level + 1)
-        self.org.download(
-            dir_path,
+        # the org subset itself isn't downloadable; fetch the files under it (each leaf is placed by its own build_path())
+        return download_leaves(
+            self.org,
             level=level + 1,
             validate_existing=validate_existing,
             reload_unconfirmable=reload_unconfirmable,
         )
 
 
+@with_slots
 @dataclass
 class Datasource(Traversable, Downloadable, Processable):
+    _CAPS = CAP_DOWNLOAD | CAP_PROCESS
+
     name: str
     path: Path
     description: Optional[str]
@@ -682,7 +1098,7 @@ class Datasource(Traversable, Downloadable, Processable):
     parent: Optional["Datasource"]
 
     def __repr__(self):
-        return f'Datasource("{self.name}", Datasets: {list(self.datasets.keys())}, Subsources: {list(self.datasources.keys())})'
+        return f'Datasource("{self.name}", Datasets: {len(self.datasets)}, Subsources: {len(self.datasources)})'
 
     def build_parent_path(self) -> Path:
 
@@ -693,34 +1109,6 @@ class Datasource(Traversable, Downloadable, Processable):
             # return self.build_parent_path()
             return self.parent.build_path()
 
-    def build_path(self):
-        return self.build_parent_path() / self.path
-
-    def traverse(
-        self, traverse_stack: deque, match_case: bool = False
-    ) -> Optional["DatasetType"]:
-
-        # base case; nothing left in the traversal stack, so this is (hopefully) what we were looking for
-        if len(traverse_stack) == 0:
-            return self
-
-        target = traverse_stack.popleft()
-
-        # try datasources first
-        have_dsource = check_dict(target, self.datasources, match_case=match_case)
-
-        if have_dsource:
-            return have_dsource.traverse(traverse_stack)
-
-        # next, datasets
-
-        have_dset = check_dict(target, self.datasets, match_case=match_case)
-
-        if have_dset:
-            return have_dset.traverse(traverse_stack, match_case=match_case)
-
-        return None
-
     def get_traversable_children(self) -> List[Traversable]:
         children = []
 
@@ -732,6 +1120,10 @@ class Datasource(Traversable, Downloadable, Processable):
 
         return children
 
+    def get_addressable_children(self) -> Dict[str, Traversable]:
+        # datasources first
+        return {**self.datasets, **self.datasources}
+
     def download(
         self,
         parent_dir: Optional[Path] = None,
@@ -739,31 +1131,16 @@ class Datasource(Traversable, Downloadable, Processable):
         validate_existing: bool = True,
         reload_unconfirmable: bool = True,
         name: Optional[Path] = None,
-    ):
-        if parent_dir is None:
-            parent_dir = self.build_parent_path()
-
-        ds_path = Path(join(parent_dir, self.name))
-
-        logging.info('{}Downloading datasource "{}"'.format("\t" * level, self.name))
-
-        for subsource_name, subsource in self.datasources.items():
-            subsource.download(
-                ds_path,
-                subsource,
-                level=level + 1,
-                validate_existing=validate_existing,
-                reload_unconfirmable=reload_unconfirmable,
-            )
+    ) -> bool:
+        level_info(f'Downloading datasource "{self.name}"', level)
 
-        for dataset_name, dataset in self.datasets.items():
-            dataset.download(
-                ds_path,
-                dataset,
-                level=level + 1,
-                validate_existing=validate_existing,
-                reload_unconfirmable=reload_unconfirmable,
-            )
+        # one flat fan-out over every file in the tree (subsources included), rather than descending & downloading one file at a time
+        return download_leaves(
+            self,
+            level=level + 1,
+            validate_existing=validate_existing,
+            reload_unconfirmable=reload_unconfirmable,
+        )
 
 
 DatasetType = Union[
@@ -772,15 +1149,306 @@ DatasetType = Union[
 DataCollection = Dict[str, DatasetType]
 
 
+# copy buffer size for HTTP downloads
+DOWNLOAD_BUFFER_SIZE = 1 << 20
+
+# write buffer size for downloaded files; a few copy chunks' worth, so the small reads a socket can hand back don't each become a write syscall
+DOWNLOAD_WRITE_BUFFERING = 4 << 20
+
+
+# downloads are written once and generally not read again soon, so tell the kernel they needn't stay in the page cache at the expense of hotter data. Pages still waiting on writeback aren't dropped; fsync'ing first would drop them too, but would make every download wait on the disk
+def drop_cached_pages(out_file) -> None:
+    if not hasattr(os, "posix_fadvise"):
+        return
+
+    out_file.flush()
+
+    try:
+        os.posix_fadvise(out_file.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+    except OSError:
+        # only a hint
+        pass
+
+# concurrent transfers (each on its own connection) per FTP remote subset; FTP servers commonly cap connections per client, so this stays small
+FTP_WORKERS = 8
+
+# copy buffer size for FTP transfers
+FTP_BUFFER_SIZE = 1 << 20
+
+
+# (path, size) of the files in a remote dir; one MLSD listing gives the names & sizes of every file, rather than a SIZE round-trip per file. Servers without MLSD get the NLST + SIZE fallback
+def ftp_list_files(
+    ftp: "ftplib.FTP", dir_path: str, level: int = 0
+) -> List[Tuple[str, Optional[str]]]:
+    import ftplib
+
+    try:
+        return [
+            (posixpath.join(dir_path, entry_name), facts.get("size"))
+            for entry_name, facts in ftp.mlsd(dir_path, facts=["type", "size"])
+            if facts.get("type") == "file"
+        ]
+    except ftplib.error_perm as e:
+        level_info(f"MLSD not available ({e}); listing with NLST", level)
+
+    remote_files = ftp.nlst(dir_path)
+
+    # SIZE is refused in ASCII mode (which NLST leaves the connection in) on some servers
+    ftp.voidcmd("TYPE I")
+
+    remote_entries = []
+
+    for remote_file in remote_files:
+        # NLST may give bare names or full paths, depending on the server; join() keeps the latter as-is
+        remote_file = posixpath.join(dir_path, remote_file)
+
+        try:
+            remote_size = ftp.size(remote_file)
+        except ftplib.error_perm:
+            # most likely a directory
+            continue
+
+        remote_entries.append(
+            (remote_file, str(remote_size) if remote_size is not None else None)
+        )
+
+    return remote_entries
+
+
+# RETR in binary mode, copying the data connection straight into the file (rather than retrbinary()'s Python callback per block); returns the number of bytes written
+def ftp_retrieve_file(
+    ftp: "ftplib.FTP", remote_path: PurePosixPath, dst_path: StrPath
+) -> int:
+    ftp.voidcmd("TYPE I")
+
+    with ftp.transfercmd(f"RETR {remote_path}") as conn:
+        with conn.makefile("rb") as src, open(
+            dst_path, "wb", buffering=DOWNLOAD_WRITE_BUFFERING
+        ) as dst:
+            shutil.copyfileobj(src, dst, FTP_BUFFER_SIZE)
+            drop_cached_pages(dst)
+            written = dst.tell()
+
+    ftp.voidresp()
+
+    return written
+
+
+# downloads are network-bound, so a handful of files in flight at once hides most of the per-file latency; override with DATASOURCER_PARALLEL
+DEFAULT_DOWNLOAD_WORKERS = 16
+
+
+# read when the pool (or session) is built rather than at import, so a bad value is reported & ignored instead of breaking the import
+def download_workers() -> int:
+    value = os.environ.get("DATASOURCER_PARALLEL")
+
+    if value is None:
+        return DEFAULT_DOWNLOAD_WORKERS
+
+    try:
+        workers = int(value)
+    except ValueError:
+        workers = 0
+
+    if workers < 1:
+        logging.warning(
+            f'Ignoring invalid DATASOURCER_PARALLEL ("{value}"); using {DEFAULT_DOWNLOAD_WORKERS} download workers'
+        )
+        return DEFAULT_DOWNLOAD_WORKERS
+
+    return workers
+
+_EXECUTOR: Optional[ThreadPoolExecutor] = None
+_EXECUTOR_LOCK = threading.Lock()
+
+
+# the pool shared by every download (and its HEAD requests) in the process, built on first use; keeps the number of transfers in flight bounded even when several datasets are downloaded at once. Work submitted here must never wait on other work submitted here
+def get_executor() -> ThreadPoolExecutor:
+    global _EXECUTOR
+
+    if _EXECUTOR is None:
+        with _EXECUTOR_LOCK:
+            if _EXECUTOR is None:
+                _EXECUTOR = ThreadPoolExecutor(
+                    max_workers=download_workers(), thread_name_prefix="datasourcer"
+                )
+
+    return _EXECUTOR
+
+
+# sends the HEAD requests for a batch of resources concurrently, ahead of downloading them, rather than one round-trip before each GET
+def prefetch_remote_sizes(resources: List[Resource], level: int = 0) -> None:
+    import requests
+
+    def fetch(resource: Resource):
+        try:
+            resource.fetch_remote_size(level=level)
+        except requests.RequestException as e:
+            # left unchecked; the resource's own download will try again
+            level_error(f'HEAD failed for "{resource.source}": {e}', level)
+
+    list(get_executor().map(fetch, resources))
+
+
+# a node & the future for work submitted on it (e.g. its download), so a failure can be reported against the file it was for
+PendingWork = Tuple[Traversable, "Future[Any]"]
+
+
+# waits on every future, however the others went; each node whose work raised or returned False is logged by path and returned, so callers can still finish up (flush manifests, process what did arrive) before failing
+def wait_for_all(
+    pending: Iterable[PendingWork], action: str = "retrieve", level: int = 0
+) -> List[Traversable]:
+    failed = []
+
+    for node, future in pending:
+        try:
+            succeeded = future.result()
+        except Exception as e:
+            level_error(f'Failed to {action} "{node.build_path()}": {e}', level)
+            failed.append(node)
+            continue
+
+        if succeeded is False:
+            level_error(f'Failed to {action} "{node.build_path()}"', level)
+            failed.append(node)
+
+    return failed
+
+
+# submits every downloadable leaf (resources & remote subsets) under a node to the shared executor & returns each with its future, without waiting on them; dynamic resources are skipped, as they're retrieved through their snapshots. Leaves whose id() is in seen are skipped (& submitted ones added to it), for callers submitting overlapping subtrees; reload_unconfirmable=None leaves each leaf to its own default
+def submit_leaf_downloads(
+    node: Traversable,
+    level: int = 0,
+    validate_existing: bool = True,
+    reload_unconfirmable: Optional[bool] = None,
+    seen: Optional[Set[int]] = None,
+) -> List[PendingWork]:
+    leaves = []
+
+    # same order as apply(), but subtrees with nothing to retrieve aren't descended into
+    stack = [(node, level)]
+
+    while stack:
+        tv, depth = stack.pop()
+
+        if not tv.has_retrievable():
+            continue
+
+        caps = tv._CAPS
+
+        if caps & CAP_DOWNLOAD and not caps & CAP_DYNAMIC and tv.can_download():
+            if seen is None:
+                leaves.append((tv, depth))
+
+            elif id(tv) not in seen:
+                seen.add(id(tv))
+                leaves.append((tv, depth))
+
+        stack.extend(
+            (child, depth + 1) for child in reversed(tv.get_traversable_children())
+        )
+
+    if not leaves:
+        return []
+
+    # list each directory that resources land in once, for validation, rather than stat'ing every file in it
+    dir_listings: Dict[Path, Dict[str, int]] = {}
+
+    if validate_existing:
+        for leaf, _ in leaves:
+            if isinstance(leaf, Resource):
+                leaf_dir = leaf.build_parent_path()
+
+                if leaf_dir not in dir_listings:
+                    dir_listings[leaf_dir] = scan_dir_sizes(leaf_dir)
+
+        # the remote size is only compared against files that are already there; anything missing is downloaded regardless
+        prefetch_remote_sizes(
+            [
+                leaf
+                for leaf, _ in leaves
+                if isinstance(leaf, Resource)
+                and leaf.retrieve_type == RetrieveType.GET
+                and leaf.path.name in dir_listings[leaf.build_parent_path()]
+                and not get_manifest(leaf.build_parent_path()).is_unchanged(
+                    leaf.build_path(), leaf.source, leaf.checksum
+                )
+            ],
+            level=level,
+        )
+
+    executor = get_executor()
+    pending = []
+
+    for leaf, depth in leaves:
+        download_kwargs = {}
+
+        if isinstance(leaf, Resource) and validate_existing:
+            download_kwargs["dir_listing"] = dir_listings[leaf.build_parent_path()]
+
+        if reload_unconfirmable is not None:
+            download_kwargs["reload_unconfirmable"] = reload_unconfirmable
+
+        future = executor.submit(
+            leaf.download,
+            level=depth,
+            validate_existing=validate_existing,
+            **download_kwargs,
+        )
+        pending.append((leaf, future))
+
+    return pending
+
+
+# downloads every downloadable leaf under a node concurrently, waiting on all of them
+def download_leaves(
+    node: Traversable,
+    level: int = 0,
+    validate_existing: bool = True,
+    reload_unconfirmable: bool = True,
+) -> bool:
+    pending = submit_leaf_downloads(
+        node,
+        level=level,
+        validate_existing=validate_existing,
+        reload_unconfirmable=reload_unconfirmable,
+    )
+
+    # wait on everything (and record what did come through) before reporting; any failed leaf fails the whole download
+    failed = wait_for_all(pending, level=level)
+
+    flush_manifests()
+
+    return not failed
+
+
+_SIZE_NAMES = ("B", "KB", "MB", "GB", "TB", "PB", "EB", "ZB", "YB")
+
+
 # from https://stackoverflow.com/questions/5194057/better-way-to-convert-file-sizes-in-python
 def convert_size(size_bytes: int) -> str:
-    if size_bytes == 0:
+    if size_bytes <= 0:
         return "0B"
-    size_name = ("B", "KB", "MB", "GB", "TB", "PB", "EB", "ZB", "YB")
-    i = int(math.floor(math.log(size_bytes, 1024)))
-    p = math.pow(1024, i)
-    s = round(size_bytes / p, 2)
-    return "%s %s" % (s, size_name[i])
+    # the unit is the power of 1024 below the size, i.e. every 10 bits; integer ops rather than a float log (which can also land just under an exact power)
+    i = min((size_bytes.bit_length() - 1) // 10, len(_SIZE_NAMES) - 1)
+    s = round(size_bytes / (1 << (i * 10)), 2)
+    return f"{s} {_SIZE_NAMES[i]}"
+
+
+# (exists, is_valid, reload_unconfirmable) -> (download?, log message)
+_VALIDATION_POLICY: Dict[Tuple[bool, Optional[bool], bool], Tuple[bool, str]] = {
+    **{
+        (False, is_valid, reload): (True, "File doesn't exist; downloading")
+        for is_valid in (True, False, None)
+        for reload in (True, False)
+    },
+    (True, True, True): (False, "Skipping download"),
+    (True, True, False): (False, "Skipping download"),
+    (True, False, True): (True, "File exists, but isn't valid"),
+    (True, False, False): (True, "File exists, but isn't valid"),
+    (True, None, True): (True, "Unconfirmable file; downloading"),
+    (True, None, False): (False, "Unconfirmable file; skipping (assumed good)"),
+}
 
 
 def check_validation_policy(
@@ -789,37 +1457,26 @@ def check_validation_policy(
     level: int = 0,
     reload_unconfirmable: bool = True,
 ) -> bool:
-    if not exists:
-        level_info("File doesn't exist; downloading", level)
-        return True
+    have_policy = _VALIDATION_POLICY.get((exists, is_valid, reload_unconfirmable))
 
-    if exists and is_valid:
-        level_info("Skipping download", level)
+    if have_policy is None:
+        level_info(
+            f"Validation policy not handled (exists? {exists}; is_valid? {is_valid})",
+            level,
+        )
         return False
 
-    if exists and is_valid is False:
-        level_info("File exists, but isn't valid", level)
-        return True
+    do_download, msg = have_policy
+    level_info(msg, level)
+    return do_download
 
-    if exists and is_valid is None:
-        if is_valid is None and reload_unconfirmable is True:
-            level_info("Unconfirmable file; downloading", level)
-            return True
-        elif is_valid is None and reload_unconfirmable is False:
-            level_info("Unconfirmable file; skipping (assumed good)", level)
-            return False
 
-    level_info(
-        "Validation policy not handled (exists? {}; is_valid? {})".format(
-            exists, is_valid
-        ),
-        level,
-    )
-    return False
+# Content-Encodings for which Content-Length is the compressed transfer size, not the size of the file on disk
+_COMPRESSED_ENCODINGS = frozenset({"gzip", "compress", "deflate", "br"})
 
 
 def get_filesize_from_headers(
-    headers: requests.structures.CaseInsensitiveDict,
+    headers: "requests.structures.CaseInsensitiveDict",
     log: bool = True,
     level: int = 0,
 ) -> Optional[int]:
@@ -829,11 +1486,9 @@ def get_filesize_from_headers(
 
     # try to figure out if we can get the uncompressed filesize from the source link; with gzip-encoding, this gives compressed transfer size
     # there's at least one more path, requesting with Accept-Encoding: "" and seeing if the transfer-encoding isn't chunked
-    if headers.get("Content-Encoding") in ["gzip", "compress", "deflate", "br"]:
+    if headers.get("Content-Encoding") in _COMPRESSED_ENCODINGS:
         log_level_if(
-            "Content-Encoding (\"{}\") is compressed; can't determine an uncompressed content length & can't validate file".format(
-                headers["Content-Encoding"]
-            ),
+            f"Content-Encoding (\"{headers['Content-Encoding']}\") is compressed; can't determine an uncompressed content length & can't validate file",
             level,
         )
         return None
@@ -851,96 +1506,424 @@ def get_filesize_from_headers(
     return filesize_src
 
 
+# size of a local file from a single stat, or None if it doesn't exist
+def local_file_size(file_path: StrPath) -> Optional[int]:
+    try:
+        return os.stat(file_path).st_size
+    except FileNotFoundError:
+        return None
+
+
+# sizes of the regular files in a dir, by name, from a single scandir pass; a missing dir just has no files
+def scan_dir_sizes(dir_path: Path) -> Dict[str, int]:
+    try:
+        with os.scandir(dir_path) as entries:
+            return {
+                entry.name: entry.stat().st_size
+                for entry in entries
+                if entry.is_file()
+            }
+    except (FileNotFoundError, NotADirectoryError):
+        return {}
+
+
+# the process umask, read (& immediately restored) once, at import; mkstemp() creates files readable by their owner only, so written files are given the mode open() would have
+_UMASK = os.umask(0o022)
+os.umask(_UMASK)
+
+
+# writes data to a uniquely named temp file beside path & swaps it in, so neither an interrupted write nor another process flushing the same file at the same time can leave a truncated or interleaved file behind
+def write_file_atomic(path: StrPath, data: bytes) -> None:
+    fd, tmp_path = tempfile.mkstemp(
+        dir=os.path.dirname(path) or ".", prefix=f".{basename(path)}.", suffix=".tmp"
+    )
+
+    try:
+        with os.fdopen(fd, "wb") as tmp_file:
+            tmp_file.write(data)
+
+        os.chmod(tmp_path, 0o666 & ~_UMASK)
+        os.replace(tmp_path, path)
+
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+
+        raise
+
+
+# per-directory record of the files retrieved into it (by name), along with each file's source & checksum and its size & mtime once it was confirmed good; lets later runs skip re-validating files nobody has touched since
+MANIFEST_NAME = ".datasourcer_manifest.json"
+
+
+class DownloadManifest:
+    def __init__(self, dir_path: Path):
+        self.path = Path(dir_path) / MANIFEST_NAME
+        self._lock = threading.Lock()
+        self._dirty = False
+
+        try:
+            with open(self.path, "r") as manifest_file:
+                self._entries: Dict[str, Dict[str, Any]] = json.load(manifest_file)
+        except (FileNotFoundError, ValueError):
+            # no (or an unreadable) manifest just means everything gets validated the usual way
+            self._entries = {}
+
+    def is_unchanged(
+        self, file_path: StrPath, source: Optional[str], checksum: Optional[str]
+    ) -> bool:
+        entry = self._entries.get(basename(file_path))
+
+        if (
+            entry is None
+            or entry.get("source") != source
+            or entry.get("checksum") != checksum
+        ):
+            return False
+
+        try:
+            st = os.stat(file_path)
+        except FileNotFoundError:
+            return False
+
+        return entry.get("size") == st.st_size and entry.get("mtime_ns") == st.st_mtime_ns
+
+    def record(
+        self,
+        file_path: StrPath,
+        source: Optional[str],
+        checksum: Optional[str],
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ) -> None:
+        st = os.stat(file_path)
+
+        with self._lock:
+            self._entries[basename(file_path)] = {
+                "source": source,
+                "checksum": checksum,
+                "size": st.st_size,
+                "mtime_ns": st.st_mtime_ns,
+                "etag": etag,
+                "last_modified": last_modified,
+            }
+            self._dirty = True
+
+    # notes a download that's about to be written, & the version of the file it's of; with no size recorded, the file doesn't count as unchanged until record() is called for it
+    def begin(
+        self,
+        file_path: StrPath,
+        source: Optional[str],
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ) -> None:
+        with self._lock:
+            self._entries[basename(file_path)] = {
+                "source": source,
+                "etag": etag,
+                "last_modified": last_modified,
+            }
+            self._dirty = True
+
+    # If-Range value for resuming the (partial) file from the same version it was started from: its strong ETag, else its Last-Modified date (weak ETags can't be used for ranges); None if neither is known
+    def resume_validator(
+        self, file_path: StrPath, source: Optional[str]
+    ) -> Optional[str]:
+        entry = self._entries.get(basename(file_path))
+
+        if entry is None or entry.get("source") != source:
+            return None
+
+        etag = entry.get("etag")
+
+        if etag is not None and not etag.startswith("W/"):
+            return etag
+
+        return entry.get("last_modified")
+
+    # written out in one go (see flush_manifests()), rather than after every file
+    def flush(self) -> None:
+        with self._lock:
+            if not self._dirty:
+                return
+
+            entries = dict(self._entries)
+            self._dirty = False
+
+        write_file_atomic(self.path, json.dumps(entries).encode())
+
+
+_MANIFESTS: Dict[str, DownloadManifest] = {}
+_MANIFESTS_LOCK = threading.Lock()
+
+
+# the manifest for a dir, loaded on first use and shared by every download into it
+def get_manifest(dir_path: Path) -> DownloadManifest:
+    dir_key = os.fspath(dir_path)
+    manifest = _MANIFESTS.get(dir_key)
+
+    if manifest is None:
+        with _MANIFESTS_LOCK:
+            manifest = _MANIFESTS.get(dir_key)
+
+            if manifest is None:
+                manifest = _MANIFESTS[dir_key] = DownloadManifest(dir_path)
+
+    return manifest
+
+
+@atexit.register
+def flush_manifests() -> None:
+    for manifest in list(_MANIFESTS.values()):
+        try:
+            manifest.flush()
+        except OSError as e:
+            logging.error(f'Failed to write download manifest "{manifest.path}": {e}')
+
+
+# copy buffer size used when hashing files
+HASH_BUFFER_SIZE = 1 << 20
+
+# checksum algorithms from optional packages (algorithm -> (module, constructor)); anything else is looked up in hashlib
+_OPTIONAL_HASHERS = {
+    "blake3": ("blake3", "blake3"),
+    "xxh3_64": ("xxhash", "xxh3_64"),
+    "xxh64": ("xxhash", "xxh64"),
+}
+
+
+# checks a file against a "<algorithm>:<hex digest>" checksum (e.g. "sha256:9f86..."); None if the algorithm isn't available
+def check_file_hash(file_path: StrPath, file_hash: str) -> Optional[bool]:
+    algo, _, expected = file_hash.partition(":")
+    algo = algo.strip().lower()
+
+    try:
+        if algo in _OPTIONAL_HASHERS:
+            module_name, ctor_name = _OPTIONAL_HASHERS[algo]
+            hasher = getattr(importlib.import_module(module_name), ctor_name)()
+        else:
+            hasher = hashlib.new(algo)
+
+    except (ImportError, ValueError):
+        logging.warning(
+            f'Checksum algorithm "{algo}" isn\'t available; not checking file contents'
+        )
+        return None
+
+    buf = bytearray(HASH_BUFFER_SIZE)
+    view = memoryview(buf)
+
+    with open(file_path, "rb", buffering=0) as in_file:
+        while True:
+            read = in_file.readinto(buf)
+
+            if not read:
+                break
+
+            hasher.update(view[:read])
+
+    return hasher.hexdigest() == expected.strip().lower()
+
+
 # returns (exists, valid) tuple where exists is a bool and valid is a bool or None for indeterminate/unknown
 # def validate_file(headers, file_path, log=True, level=0, validate_size=True):
 def validate_file(
-    file_path: Path,
+    file_path: StrPath,
     remote_filesize: Optional[int] = None,
     file_hash: Optional[str] = None,
     log: bool = True,
     level: int = 0,
     validate_size: bool = True,
+    dir_listing: Optional[Dict[str, int]] = None,
 ) -> Tuple[bool, Optional[bool]]:
     def log_level_if(string, level):
         if log:
             level_info(string, level)
 
-    if not exists(file_path):
-        return (False, False)
+    # a listing of the file's dir (see scan_dir_sizes()) answers both questions without touching the filesystem
+    if dir_listing is not None:
+        filesize = dir_listing.get(basename(file_path))
 
-    filesize = getsize(file_path)
+        if filesize is None:
+            return (False, False)
+
+    else:
+        filesize = local_file_size(file_path)
+
+        if filesize is None:
+            return (False, False)
+
+    is_valid: Optional[bool] = None
 
     if remote_filesize is not None:
         # file size validation logic block; various checks and logs based on function params and local vs. source file sizes
         if filesize == remote_filesize:
             log_level_if(
-                "File already exists: {} vs. expected {} (size match; skip retrieve)".format(
-                    convert_size(filesize), convert_size(remote_filesize)
-                ),
+                f"File already exists: {convert_size(filesize)} vs. expected {convert_size(remote_filesize)} (size match; skip retrieve)",
                 level,
             )
-            return (True, True)
+            is_valid = True
         else:
             log_level_if(
-                "File already exists: {} vs. expected {} (mismatch; retrieve from source)".format(
-                    convert_size(filesize), convert_size(remote_filesize)
-                ),
+                f"File already exists: {convert_size(filesize)} vs. expected {convert_size(remote_filesize)} (mismatch; retrieve from source)",
                 level,
             )
             return (True, False)
 
-    else:
-        return (True, None)
+    # a matching size doesn't rule out corrupted contents; when the spec gives a checksum, check those too
+    if file_hash is not None:
+        hash_matches = check_file_hash(file_path, file_hash)
+
+        if hash_matches is not None:
+            log_level_if(
+                "Checksum match"
+                if hash_matches
+                else "Checksum mismatch; retrieve from source",
+                level,
+            )
+            return (True, hash_matches)
+
+    return (True, is_valid)
 
 
 def get_chunked(
     source_url: str,
-    dst_path: Path,
+    dst_path: StrPath,
     log: bool = True,
     level: int = 0,
-    cp_percent: float = 0.1,
-) -> None:
-    resp = requests.get(source_url, stream=True)
+    progress_interval: float = 2.0,
+    resume_from: int = 0,
+    if_range: Optional[str] = None,
+    on_response: Optional[
+        Callable[["requests.structures.CaseInsensitiveDict"], None]
+    ] = None,
+) -> Optional["requests.structures.CaseInsensitiveDict"]:
+    import requests
+
+    # downloads run concurrently, so every line says which file it's about
+    def log_info(msg: str) -> None:
+        level_info(f"{dst_path}: {msg}", level)
+
+    def log_error(msg: str) -> None:
+        level_error(f"{dst_path}: {msg}", level)
+
+    resume_headers = None
+
+    # pick up where a previous (interrupted) download left off, but only from the same version of the file: If-Range (the partial file's ETag or Last-Modified) has the server send the whole file instead if it has changed since. Ranges apply to the encoded body, which the session already asks to be unencoded
+    if resume_from > 0 and if_range is not None:
+        resume_headers = {"Range": f"bytes={resume_from}-", "If-Range": if_range}
+    else:
+        resume_from = 0
+
+    resp = get_session().get(source_url, stream=True, headers=resume_headers)
+
+    if resume_from > 0 and resp.status_code == 416:
+        resp.close()
+
+        # nothing past resume_from; if that's the whole file (per Content-Range's "bytes */<size>"), the local one is already complete
+        if resp.headers.get("Content-Range") == f"bytes */{resume_from}":
+            log_info("File was already completely retrieved")
+            return resp.headers
+
+        log_info("Server can't resume the download; fetching the whole file")
+        resume_from = 0
+        resp = get_session().get(source_url, stream=True)
+
+    # an error page isn't the file; fail before anything is written
+    resp.raise_for_status()
+
+    resuming = False
+
+    if resume_from > 0 and resp.status_code == 206:
+        if not resp.headers.get("Content-Range", "").startswith(f"bytes {resume_from}-"):
+            resp.close()
+            raise requests.HTTPError(
+                f"Range response doesn't start at byte {resume_from} (Content-Range: {resp.headers.get('Content-Range')})",
+                response=resp,
+            )
+
+        resuming = True
+
+    elif resp.status_code != 200:
+        resp.close()
+        raise requests.HTTPError(
+            f"Unexpected response status {resp.status_code} for {source_url}",
+            response=resp,
+        )
+
+    elif resume_from > 0:
+        # the file changed since the partial download (or the server ignores ranges), so the whole thing is coming; the partial file is truncated below
+        log_info("Server didn't resume the download; fetching the whole file")
+
+    offset = resume_from if resuming else 0
+
+    if on_response is not None:
+        on_response(resp.headers)
+
+    if resuming:
+        log_info(f"Resuming download ({convert_size(resume_from)} already retrieved)")
 
     # grabbing file size and generating the "size string" (to reuse later, esp. since the no-size logic would clutter later code)
     filesize_src = None
     size_str = "??"
-    if resp.headers.get("Content-Length") is not None and resp.headers.get(
-        "Content-Encoding"
-    ) not in ["gzip", "compress", "deflate", "br"]:
-        filesize_src = int(resp.headers.get("Content-Length"))
+    content_length = resp.headers.get("Content-Length")
+
+    if (
+        content_length is not None
+        and resp.headers.get("Content-Encoding") not in _COMPRESSED_ENCODINGS
+    ):
+        filesize_src = offset + int(content_length)
         size_str = convert_size(filesize_src)
-        level_info("File size is {}".format(size_str), level)
+        log_info(f"File size is {size_str}")
     else:
-        level_info("File size is unknown", level)
+        log_info("File size is unknown")
 
-    # 'checkpoint' chunk sizing, for logging purposes (every 10% by default)
-    cp_chunk_size = (
-        int(cp_percent * filesize_src) if filesize_src is not None else 1024 ** 2 * 100
-    )
-    cp_chunk_idx = 0
+    def progress_str(done: int) -> str:
+        percent = int(done / filesize_src * 100) if filesize_src else "??"
+        return f"{convert_size(done)} / {size_str} ({percent}%)"
 
-    with open(dst_path, "wb") as out_file:
-        chunk_accum = 0
-        for chunk in resp.iter_content(chunk_size=1024 ** 2):
-            out_file.write(chunk)
+    # the file only ever holds what's actually been received (no preallocation), so an interrupted download can be told apart from a complete one, and resumed
+    with open(
+        dst_path, "ab" if resuming else "wb", buffering=DOWNLOAD_WRITE_BUFFERING
+    ) as out_file:
+        # progress is logged from the side, so the copy loop itself stays entirely in C
+        copy_done = threading.Event()
 
-            chunk_accum = chunk_accum + len(chunk)
+        def log_progress():
+            while not copy_done.wait(progress_interval):
+                log_info(progress_str(out_file.tell()))
 
-            if cp_chunk_idx * cp_chunk_size < chunk_accum:
-                cp_chunk_idx = cp_chunk_idx + 1
+        if log:
+            progress_thread = threading.Thread(target=log_progress, daemon=True)
+            progress_thread.start()
 
-                if log:
-                    level_info(
-                        "{} / {} ({}%)".format(
-                            convert_size(chunk_accum),
-                            size_str,
-                            int(chunk_accum / filesize_src * 100)
-                            if filesize_src is not None
-                            else "??",
-                        ),
-                        level,
-                    )
+        try:
+            resp.raw.decode_content = True
+            shutil.copyfileobj(resp.raw, out_file, DOWNLOAD_BUFFER_SIZE)
+        finally:
+            copy_done.set()
+
+            if log:
+                progress_thread.join()
+
+        drop_cached_pages(out_file)
+
+        written = out_file.tell()
+
+        if log:
+            log_info(progress_str(written))
+
+    # a body that ends early (e.g. the connection was closed on us) leaves a partial file, which isn't reported as retrieved
+    if filesize_src is not None and written != filesize_src:
+        log_error(
+            f"Download incomplete ({convert_size(written)} of {size_str} retrieved)"
+        )
+        return None
+
+    # headers of the response the file came from (e.g. its ETag, the version that was retrieved)
+    return resp.headers
 
 
 def level_info(msg: Any, level: int) -> None:
@@ -952,40 +1935,106 @@ def level_error(msg: Any, level: int) -> None:
 
 
 def level_log(log_fn: Callable[..., None], msg: Any, level: int = 0) -> None:
-    log_fn("{}{}".format("\t" * level, msg))
+    indent = "\t" * level
+    log_fn(f"{indent}{msg}")
 
 
-def parse_datasource_directory(dir: Path) -> dict:
-    for root, dirs, files in os.walk(dir):
-        pass
+# every node in a datasource collection, keyed by its full qualifier as a tuple of (casefolded, unless match_case) parts; built in one pass, so each lookup afterwards is a single dict get
+FlatIndex = Dict[Tuple[str, ...], DatasetType]
+
+
+def build_flat_index(spec: DataCollection, match_case: bool = False) -> FlatIndex:
+    flat_index: FlatIndex = {}
+    pending: List[Tuple[Tuple[str, ...], Dict[str, Traversable]]] = [((), spec)]
+
+    while pending:
+        prefix, children = pending.pop()
+
+        for name, child in children.items():
+            # failed parses leave None entries behind
+            if child is None:
+                continue
+
+            qual = prefix + (name if match_case else name.casefold(),)
+            flat_index[qual] = child
+            pending.append((qual, child.get_addressable_children()))
 
-    return {}
+    return flat_index
 
 
 # TODO support a more flexible qualifier system, e.g. with quotes? e.g., a.b."longer c.with.delimiters.as.part.of.identifier.kml".d
 def retrieve_by_qualifier(
-    spec: DataCollection, qualifier: str, delimiter: str = ".", match_case: bool = False
-) -> Tuple[str, Optional[DatasetType]]:
-
-    qual_parts = qualifier.split(delimiter)
-    qual_stack = deque(qual_parts)
+    spec: DataCollection,
+    qualifier: Union[str, Sequence[str]],
+    delimiter: str = ".",
+    match_case: bool = False,
+    flat_index: Optional[FlatIndex] = None,
+) -> Optional[DatasetType]:
+
+    # also accepts a qualifier that's already been split into its parts; either way, it ends up as one tuple that's indexed into (never consumed), so it can key the index below as-is
+    qual_parts = tuple(
+        qualifier.split(delimiter) if isinstance(qualifier, str) else qualifier
+    )
 
-    # print(qual_parts, qual_stack)
+    # with an index of the spec (built with the same match_case), skip the traversal altogether
+    if flat_index is not None:
+        if not match_case:
+            qual_parts = tuple(part.casefold() for part in qual_parts)
 
-    first = qual_stack.popleft()
+        return flat_index.get(qual_parts)
 
-    have_first = check_dict(first, spec, match_case=match_case)
+    have_first = check_dict(qual_parts[0], spec, match_case=match_case)
 
     if not have_first:
         return None
 
-    if len(qual_stack) == 0:
-        return have_first
+    return resolve_parts(have_first, qual_parts, 1, match_case=match_case)
+
+
+# walks parts[i:] down from node in a single loop (no call frame or stack mutation per level); the lookup order at each level sets the precedence on name collisions
+def resolve_parts(
+    node: Traversable,
+    parts: Tuple[str, ...],
+    i: int = 0,
+    match_case: bool = False,
+) -> Optional[DatasetType]:
+    while i < len(parts):
+        target = parts[i]
+        i += 1
 
-    # name, retrieved = have_first.traverse(qual_stack, match_case=match_case)
-    retrieved = have_first.traverse(qual_stack, match_case=match_case)
+        # qualifiers address the (org)anization of a dataset (i.e. the dir) directly
+        if isinstance(node, Dataset):
+            node = node.org
+
+        if isinstance(node, Datasource):
+            # datasources first, then datasets
+            child = node.lookup_child(
+                "datasources", target, match_case=match_case
+            ) or node.lookup_child("datasets", target, match_case=match_case)
+
+        elif isinstance(node, RemoteSubset):
+            # can't (yet) request a subfile for a remote directory
+            return None
+
+        elif isinstance(node, Subset):
+            # files first
+            child = node.lookup_child("resources", target, match_case=match_case)
+
+            if not child:
+                child = node.lookup_child("subsets", target, match_case=match_case)
+
+            elif i < len(parts):
+                # don't try to traverse a file; fail safely and make the user specify
+                logging.error(f"Can't traverse a file ({child}), attempting: {parts[i:]}.")
+                return None
+
+        else:
+            # resources have no nested structures
+            return node
+
+        if not child:
+            return None
 
-    # print("retrieved:", retrieved)
-    # bp()
+        node = child
 
-    return retrieved
+    return node
@@ -1,203 +1,388 @@
-import copy
-import json
 import logging
-import pprint
-from glob import glob
-from os.path import (abspath, basename, dirname, exists, getsize, isdir,
-                     isfile, join)
+import multiprocessing
+import os
+import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import MISSING, dataclass, fields
+from functools import lru_cache, partial
+from itertools import repeat
+from os.path import abspath
 from pathlib import Path
-from pdb import set_trace as bp
-from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+from stat import S_ISREG
+from sys import intern
+from typing import (Any, Callable, Dict, FrozenSet, Iterator, List, Optional,
+                    Tuple, Union)
 from urllib.parse import urlparse
 
 # import pyyaml
 import yaml
 
+# prefer the libyaml-backed loader, which is several times faster than the pure-Python one
+try:
+    from yaml import CSafeLoader as YamlLoader
+except ImportError:
+    from yaml import SafeLoader as YamlLoader
+
+# likewise orjson for JSON datasource files, if it's installed
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
+
 from .datasourcer import (CreateType, DataCollection, DataContext, Dataset,
                           Datasource, DirectoryType, DynamicResource,
                           FileFormat, FileFormatProcessor,
                           FileFormatToExtensionMap, RemoteSubset, Resource,
                           RetrieveType, StaticResource, Subset)
 
+# spec value -> enum member, built once; a dict lookup skips Enum's __call__ machinery (and the ValueError it builds on a miss) per node
+_FILE_FORMATS = {m.value: m for m in FileFormat}
+_RETRIEVE_TYPES = {m.value: m for m in RetrieveType}
+_CREATE_TYPES = {m.value: m for m in CreateType}
+_DIRECTORY_TYPES = {m.value: m for m in DirectoryType}
 
-def parse_datasource_spec(
-    name: str, ds_spec: dict, parent: Optional[Datasource], data_context: DataContext
-) -> Optional[Datasource]:
-    # ds_copy = Datasource(**copy.deepcopy(ds_spec))
-    ds_copy = copy.deepcopy(ds_spec)
+# defers pretty-printing a spec until a log record is actually formatted, so neither the pformat call nor the pprint import is paid unless the message is emitted
+class SpecFormat:
+    __slots__ = ("spec",)
 
-    try:
-        ds_obj = Datasource(
-            name=name,
-            path=Path(str(name)),
-            **ds_copy,
-            parent=parent,
-            data_context=data_context,
-        )
-    except TypeError as e:
-        logging.error(
-            "Malformed datasource spec: {}\nObject: {}".format(
-                e, pprint.pformat(ds_spec, depth=1, indent=4)
+    def __init__(self, spec: Any):
+        self.spec = spec
+
+    def __str__(self) -> str:
+        from pprint import pformat
+
+        return pformat(self.spec, depth=1, indent=4)
+
+
+# a GET source needs a scheme & a host; a precompiled match on just that prefix is much cheaper than a full urlparse
+_URL_RE = re.compile(r"[A-Za-z][A-Za-z0-9+\-.]*://[^/?#\s]+", re.ASCII)
+
+# the spec keys a node class accepts & requires, i.e. its init fields less the ones the parser supplies itself; specs are checked against this up front with a couple of set operations, rather than by constructing the node & catching the TypeError
+@dataclass(frozen=True)
+class SpecSchema:
+    accepted: FrozenSet[str]
+    required: FrozenSet[str]
+
+    @classmethod
+    def of(cls, node_cls: type, supplied: FrozenSet[str]) -> "SpecSchema":
+        init_fields = [f for f in fields(node_cls) if f.init]
+
+        return cls(
+            accepted=frozenset(f.name for f in init_fields) - supplied,
+            required=frozenset(
+                f.name
+                for f in init_fields
+                if f.default is MISSING and f.default_factory is MISSING
             )
+            - supplied,
         )
 
-        return None
+    # None if the spec's keys fit, else what's wrong with them
+    def problems(self, spec: dict) -> Optional[str]:
+        unknown = spec.keys() - self.accepted
+        missing = self.required - spec.keys()
 
-    datasets = {}
-    for subset_name, subset_spec in ds_copy["datasets"].items():
-        # ds_copy["datasets"][subset_name] = parse_dataset_spec(subset_spec)
-        datasets[subset_name] = parse_dataset_spec(subset_name, subset_spec, ds_obj)
+        if not unknown and not missing:
+            return None
 
-    ds_obj.datasets = datasets
+        return f"unknown keys {sorted(unknown, key=str)}, missing keys {sorted(missing)}"
 
-    datasources = {}
-    for subsource_name, subsource_spec in ds_copy["datasources"].items():
-        # ds_copy["datasources"][subsource_name] = parse_datasource_spec(subsource_spec)
-        datasources[subsource_name] = parse_datasource_spec(
-            subsource_name, subsource_spec, ds_obj, data_context
-        )
 
-    ds_obj.datasources = datasources
+_NODE_SUPPLIED = frozenset(("name", "path", "parent"))
 
-    return ds_obj
+_DATASOURCE_SCHEMA = SpecSchema.of(Datasource, _NODE_SUPPLIED | {"data_context"})
+_DATASET_SCHEMA = SpecSchema.of(Dataset, _NODE_SUPPLIED)
+_SUBSET_SCHEMA = SpecSchema.of(Subset, _NODE_SUPPLIED)
+_REMOTE_SUBSET_SCHEMA = SpecSchema.of(
+    RemoteSubset, _NODE_SUPPLIED | {"subsets", "resources"}
+)
+_STATIC_RESOURCE_SCHEMA = SpecSchema.of(
+    StaticResource, _NODE_SUPPLIED | {"processor", "file_type", "retrieve_type"}
+)
+_DYNAMIC_RESOURCE_SCHEMA = SpecSchema.of(
+    DynamicResource,
+    _NODE_SUPPLIED | {"processor", "file_type", "retrieve_type", "extension"},
+)
 
+# file suffixes picked up when scanning a datasource directory
+DATASOURCE_FILE_SUFFIXES = (".yml", ".yaml", ".json")
 
-def parse_dataset_spec(name: str, ds_spec: dict, parent: Datasource):
-    ds_copy = copy.deepcopy(ds_spec)
+# below this many files, or this many bytes between them, process pool startup (~150 ms, before the parsed trees are pickled back) costs more than parallel parsing saves; the YAML loader gets through a few MB/s
+PARALLEL_PARSE_MIN_FILES = 2
+PARALLEL_PARSE_MIN_BYTES = 1 << 20
 
-    try:
-        ds_obj = Dataset(name=name, path=Path(str(name)), **ds_copy, parent=parent)
-    except TypeError as e:
+# upper bound on files sent to a parse worker per task
+PARALLEL_PARSE_CHUNKSIZE = 4
+
+
+# file metadata captured once (e.g. from a scandir DirEntry) and threaded through parsing, so nothing downstream needs to stat the file again
+@dataclass
+class FileInfo:
+    path: Path
+    size: int
+    mtime_ns: int
+
+    @classmethod
+    def from_dir_entry(cls, entry: os.DirEntry) -> "FileInfo":
+        st = entry.stat()
+        return cls(path=Path(entry.path), size=st.st_size, mtime_ns=st.st_mtime_ns)
+
+
+# a pending node: (builder, name, spec, parent, target, key); once built, the node is stored at target[key] (target being the parent's child dict) or, for non-dict targets, as attribute key of target
+ParseJob = Tuple[Callable, str, dict, Any, Any, str]
+
+# builders construct a single node from its spec & hand back jobs for its children, rather than recursing into them
+BuildResult = Tuple[Any, List[ParseJob]]
+
+
+# parses a spec subtree from the top down with a worklist of pending nodes, rather than a call frame per level; children of each node are built in spec order, so child dicts keep that order
+# node names repeat heavily within & across spec files (the same dataset & resource names under every datasource), & the loader hands back a fresh str for each occurrence; interning keeps one copy per distinct name. enum-valued fields don't need this, as they resolve to shared enum members
+def _intern_name(name: Any) -> Any:
+    return intern(name) if type(name) is str else name
+
+
+# a node's path is just its name; node names repeat a lot (see _intern_name) & Path construction parses the string every time, so build each distinct one once. Paths are immutable, so sharing them between nodes is safe
+@lru_cache(maxsize=4096)
+def _name_path(name: Any) -> Path:
+    return Path(str(name))
+
+
+def _parse_tree(
+    builder: Callable[..., BuildResult],
+    name: str,
+    spec: dict,
+    parent: Any,
+    data_context: Optional[DataContext],
+):
+    root, jobs = builder(_intern_name(name), spec, parent, data_context)
+    pending = deque(jobs)
+
+    while pending:
+        builder, name, spec, parent, target, key = pending.popleft()
+        # child dict keys & names are the same object, so interning the key again is just a lookup
+        key = _intern_name(key)
+        node, children = builder(_intern_name(name), spec, parent, data_context)
+
+        if type(target) is dict:
+            target[key] = node
+        else:
+            setattr(target, key, node)
+
+        pending.extend(children)
+
+    return root
+
+
+def _build_datasource(
+    name: str, ds_spec: dict, parent: Optional[Datasource], data_context: DataContext
+) -> BuildResult:
+    problems = _DATASOURCE_SCHEMA.problems(ds_spec)
+
+    if problems is not None:
         logging.error(
-            "Malformed dataset spec: {}\nObject: {}".format(
-                e, pprint.pformat(ds_spec, depth=1, indent=4)
-            )
+            "Malformed datasource spec: %s\nObject: %s", problems, SpecFormat(ds_spec)
+        )
+        return None, []
+
+    # specs are read once & never mutated while parsing, so they're used as-is rather than deep copied at every level; only the builders that pop keys work on a (shallow) copy
+    ds_obj = Datasource(
+        name=name,
+        path=_name_path(name),
+        **ds_spec,
+        parent=parent,
+        data_context=data_context,
+    )
+
+    ds_obj.datasets = {}
+    ds_obj.datasources = {}
+
+    jobs: List[ParseJob] = [
+        (_build_dataset, subset_name, subset_spec, ds_obj, ds_obj.datasets, subset_name)
+        for subset_name, subset_spec in ds_spec["datasets"].items()
+    ]
+    jobs.extend(
+        (
+            _build_datasource,
+            subsource_name,
+            subsource_spec,
+            ds_obj,
+            ds_obj.datasources,
+            subsource_name,
         )
+        for subsource_name, subsource_spec in ds_spec["datasources"].items()
+    )
 
-        return None
+    return ds_obj, jobs
 
-    # bp()
-    # ds_copy["org"] = parse_dir_spec(ds_copy["org"])
-    ds_obj.org = parse_subset_spec("data", ds_copy["org"], ds_obj)
-    # bp()
 
-    return ds_obj
+def _build_dataset(
+    name: str, ds_spec: dict, parent: Datasource, data_context=None
+) -> BuildResult:
+    problems = _DATASET_SCHEMA.problems(ds_spec)
 
+    if problems is not None:
+        logging.error(
+            "Malformed dataset spec: %s\nObject: %s", problems, SpecFormat(ds_spec)
+        )
+        return None, []
 
-def parse_subset_spec(
-    name: str, dir_spec: dict, parent: Union[Dataset, Subset]
-) -> Union[None, Subset, RemoteSubset]:
-    ds_copy = copy.deepcopy(dir_spec)
+    ds_obj = Dataset(name=name, path=_name_path(name), **ds_spec, parent=parent)
 
-    dir_obj: Union[None, Subset, RemoteSubset] = None
+    # org is overwritten by its job (with None, if the subset spec is malformed), so there's no need to clear it in between
+    return ds_obj, [(_build_subset, "data", ds_spec["org"], ds_obj, ds_obj, "org")]
 
-    try:
-        ds_type = DirectoryType(ds_copy["type"])
-        # remove type from the dict; don't need it for unmarshalling past determining dir type
-        ds_copy.pop("type", None)
-    except ValueError as e:
+
+def _build_subset(
+    name: str, dir_spec: dict, parent: Union[Dataset, Subset], data_context=None
+) -> BuildResult:
+    ds_copy = dict(dir_spec)
+
+    if "type" not in ds_copy:
+        logging.error("Subset spec is missing its 'type': %s", SpecFormat(dir_spec))
+        return None, []
+
+    ds_type = _DIRECTORY_TYPES.get(ds_copy["type"])
+
+    if ds_type is None:
         logging.error(
             f"Subset type not specified or invalid (type string: '{ds_copy['type']}')"
         )
-        return None
-    except KeyError as e:
-        bp()
-
-    # bp()
-    # if set(ds_copy.keys()) == set(Directory.__annotations__):
-    if ds_type == DirectoryType.LOCAL:
-
-        try:
-            dir_obj = Subset(name=name, path=Path(str(name)), **ds_copy, parent=parent)
-        except TypeError as e:
-            logging.error(
-                "Malformed dir spec: {}\nObject: {}".format(
-                    e, pprint.pformat(dir_spec, depth=1, indent=4)
-                )
-            )
+        return None, []
 
-            return None
+    # remove type from the dict; don't need it for unmarshalling past determining dir type
+    ds_copy.pop("type", None)
 
-        subsets = {}
-        for subdir_name, subdir in ds_copy["subsets"].items():
-            subsets[subdir_name] = parse_subset_spec(subdir_name, subdir, dir_obj)
+    subset_builder = _SUBSET_BUILDERS.get(ds_type)
 
-        dir_obj.subsets = subsets
+    if subset_builder is None:
+        logging.error(
+            "Directory spec doesn't match Directory or RemoteDirectory (keys are %s)\nObject: %s",
+            ds_copy.keys(),
+            SpecFormat(dir_spec),
+        )
+        return None, []
 
-        resources = {}
-        for subfile_name, subfile in ds_copy["resources"].items():
-            resources[subfile_name] = parse_resource_spec(
-                subfile_name, subfile, dir_obj
-            )
+    return subset_builder(name, ds_copy, dir_spec, parent)
 
-        dir_obj.resources = resources
-
-        return dir_obj
-
-    # elif set(ds_copy.keys()) == set(RemoteDirectory.__annotations__):
-    if ds_type == DirectoryType.REMOTE:
-
-        try:
-            # ds_copy['create_type']= CreateType(ds_copy['create_type'])
-            ds_copy["retrieve_type"] = RetrieveType(ds_copy["retrieve_type"])
-        except ValueError as e:
-            print(e)
-
-        try:
-            # bp()
-            dir_obj = RemoteSubset(
-                name=name,
-                path=Path(str(name)),
-                # TODO these should be handled later
-                subsets=None,
-                resources=None,
-                **ds_copy,
-                parent=parent,
-            )
-        except TypeError as e:
-            logging.error(
-                "Malformed remote dir spec: {}\nObject: {}".format(
-                    e, pprint.pformat(dir_spec, depth=1, indent=4)
-                )
-            )
 
-            return None
+def _build_local_subset(
+    name: str, ds_copy: dict, dir_spec: dict, parent: Union[Dataset, Subset]
+) -> BuildResult:
+    problems = _SUBSET_SCHEMA.problems(ds_copy)
 
-        return dir_obj
+    if problems is not None:
+        logging.error("Malformed dir spec: %s\nObject: %s", problems, SpecFormat(dir_spec))
+        return None, []
 
-    else:
+    dir_obj = Subset(name=name, path=_name_path(name), **ds_copy, parent=parent)
+
+    dir_obj.subsets = {}
+    dir_obj.resources = {}
+
+    jobs: List[ParseJob] = [
+        (_build_subset, subdir_name, subdir, dir_obj, dir_obj.subsets, subdir_name)
+        for subdir_name, subdir in ds_copy["subsets"].items()
+    ]
+    jobs.extend(
+        (
+            _build_resource,
+            subfile_name,
+            subfile,
+            dir_obj,
+            dir_obj.resources,
+            subfile_name,
+        )
+        for subfile_name, subfile in ds_copy["resources"].items()
+    )
+
+    return dir_obj, jobs
+
+
+def _build_remote_subset(
+    name: str, ds_copy: dict, dir_spec: dict, parent: Union[Dataset, Subset]
+) -> BuildResult:
+    problems = _REMOTE_SUBSET_SCHEMA.problems(ds_copy)
+
+    if problems is not None:
         logging.error(
-            "Directory spec doesn't match Directory or RemoteDirectory (keys are {})\nObject: {}".format(
-                ds_copy.keys(), pprint.pformat(dir_spec, depth=1, indent=4)
-            )
+            "Malformed remote dir spec: %s\nObject: %s", problems, SpecFormat(dir_spec)
         )
-        return None
+        return None, []
+
+    # ds_copy['create_type']= CreateType(ds_copy['create_type'])
+    retrieve_type = _RETRIEVE_TYPES.get(ds_copy["retrieve_type"])
+
+    if retrieve_type is None:
+        logging.error(
+            "%r is not a valid RetrieveType\nObject: %s",
+            ds_copy["retrieve_type"],
+            SpecFormat(dir_spec),
+        )
+        return None, []
+
+    ds_copy["retrieve_type"] = retrieve_type
 
+    dir_obj = RemoteSubset(
+        name=name,
+        path=_name_path(name),
+        # TODO these should be handled later
+        subsets=None,
+        resources=None,
+        **ds_copy,
+        parent=parent,
+    )
 
-# def download_directory(parent_dir: Path, directory: Directory, level: int = 1) -> None:
+    return dir_obj, []
 
-#     logging.info(
-#         '{}Downloading contents of directory "{}"'.format(
-#             "\t" * level, directory.path_name
-#         )
-#     )
 
-#     dir_path = Path(join(parent_dir, directory.path_name))
+def _build_resource(
+    name: str, file_spec: dict, parent: Subset, data_context=None
+) -> BuildResult:
+    return parse_resource_spec(name, file_spec, parent), []
 
-#     # either handle as a regular directory, or as a RemoteDirectory
-#     if isinstance(directory, Directory):
-#     elif isinstance(directory, RemoteDirectory):
-#         download_remote_directory(dir_path, directory, level=level)
+
+# subset type -> builder
+_SUBSET_BUILDERS = {
+    DirectoryType.LOCAL: _build_local_subset,
+    DirectoryType.REMOTE: _build_remote_subset,
+}
+
+
+def parse_datasource_spec(
+    name: str, ds_spec: dict, parent: Optional[Datasource], data_context: DataContext
+) -> Optional[Datasource]:
+    return _parse_tree(_build_datasource, name, ds_spec, parent, data_context)
+
+
+def parse_dataset_spec(name: str, ds_spec: dict, parent: Datasource):
+    return _parse_tree(_build_dataset, name, ds_spec, parent, None)
+
+
+def parse_subset_spec(
+    name: str, dir_spec: dict, parent: Union[Dataset, Subset]
+) -> Union[None, Subset, RemoteSubset]:
+    return _parse_tree(_build_subset, name, dir_spec, parent, None)
 
 
 def parse_processor_spec(proc_spec: dict) -> Optional[FileFormatProcessor]:
     return None
 
 
-def parse_resource_spec(
-    name: str, file_spec: dict, parent: Subset
-) -> Optional[Resource]:
-    fs_copy = copy.deepcopy(file_spec)
+# a resource spec compiled down to its constructor inputs: (resource class, spec fields, derived fields, checksum, source is valid)
+ResourceTemplate = Tuple[Optional[type], dict, dict, Any, bool]
+
+# compiled resource specs keyed by spec identity, holding the spec itself so a recycled id can't be mistaken for a hit; templated blocks (YAML anchors/aliases) load as one shared dict, so every occurrence after the first goes straight to construction
+_RESOURCE_TEMPLATES: Dict[int, Tuple[dict, ResourceTemplate]] = {}
+RESOURCE_TEMPLATE_CACHE_SIZE = 4096
+
+
+def clear_resource_templates() -> None:
+    _RESOURCE_TEMPLATES.clear()
+
+
+def compile_resource_spec(file_spec: dict) -> ResourceTemplate:
+    fs_copy = dict(file_spec)
 
     # pop out all of the attributes that will need to be separately processed; after this, only POJOs that get passed directly to the resource ctor should remain
     format_name = fs_copy.pop("format_name", None)
@@ -211,100 +396,167 @@ def parse_resource_spec(
     retain = fs_copy.pop("retain", None)
     template_types = fs_copy.pop("template_types", None)
     unzip = fs_copy.pop("unzip", None)
+    checksum = fs_copy.pop("checksum", None)
 
     processor = parse_processor_spec(process_spec)
 
-    try:
-        # fs_copy["file_type"] = FileFormat(fs_copy["file_type"])
-        # fs_copy["retrieve_type"] = RetrieveType(fs_copy["retrieve_type"])
-        # fs_copy["create_type"] = CreateType(fs_copy["create_type"])
-        file_type_ret = FileFormat(file_type)
-        retrieve_type_ret = RetrieveType(retrieve_type)
-        create_type_ret = CreateType(create_type)
-
-    except ValueError as e:
-        print(e)
-        bp()
+    # fs_copy["file_type"] = FileFormat(fs_copy["file_type"])
+    # fs_copy["retrieve_type"] = RetrieveType(fs_copy["retrieve_type"])
+    # fs_copy["create_type"] = CreateType(fs_copy["create_type"])
+    file_type_ret = _FILE_FORMATS.get(file_type)
+    retrieve_type_ret = _RETRIEVE_TYPES.get(retrieve_type)
+    create_type_ret = _CREATE_TYPES.get(create_type)
+
+    if file_type_ret is None or retrieve_type_ret is None or create_type_ret is None:
+        e = ValueError(
+            f"Invalid file_type/retrieve_type/create_type: {file_type!r}/{retrieve_type!r}/{create_type!r}"
+        )
+        logging.error("Malformed file spec: %s\nObject: %s", e, SpecFormat(file_spec))
         raise e
 
-    extension_ret = FileFormatToExtensionMap.get(file_type_ret, "UNK")
+    derived = {
+        "processor": processor,
+        # "create_type": create_type_ret,
+        "file_type": file_type_ret,
+        "retrieve_type": retrieve_type_ret,
+    }
 
-    file_obj: Optional[Resource] = None
+    resource_cls: Optional[type] = None
+    schema: Optional[SpecSchema] = None
 
-    try:
-        if create_type == CreateType.STATIC:
-            file_obj = StaticResource(
-                name=name,
-                path=Path(str(name)),
-                **fs_copy,
-                parent=parent,
-                processor=processor,
-                # create_type=create_type_ret,
-                file_type=file_type_ret,
-                retrieve_type=retrieve_type_ret,
-            )
-        elif create_type == CreateType.DYNAMIC:
-            file_obj = DynamicResource(
-                # TODO this abstraction doesn't seem correct
-                name=name,
-                path=None,
-                extension=extension_ret,
-                **fs_copy,
-                parent=parent,
-                processor=processor,
-                # create_type=create_type_ret,
-                file_type=file_type_ret,
-                retrieve_type=retrieve_type_ret,
-            )
+    if create_type_ret == CreateType.STATIC:
+        resource_cls = StaticResource
+        schema = _STATIC_RESOURCE_SCHEMA
+    elif create_type_ret == CreateType.DYNAMIC:
+        # TODO this abstraction doesn't seem correct
+        resource_cls = DynamicResource
+        schema = _DYNAMIC_RESOURCE_SCHEMA
+        derived["extension"] = FileFormatToExtensionMap.get(file_type_ret, "UNK")
 
-    except TypeError as e:
+    problems = schema.problems(fs_copy) if schema is not None else None
+
+    if problems is not None:
         logging.error(
-            "Malformed file spec: {}\nObject: {}".format(
-                e, pprint.pformat(file_spec, depth=1, indent=4)
-            )
+            "Malformed file spec: %s\nObject: %s", problems, SpecFormat(file_spec)
         )
+        raise TypeError(problems)
 
-        raise e
-        return None
+    source_valid = True
 
     if retrieve_type_ret == RetrieveType.GET:
-        url_check = urlparse(fs_copy["source"])
-        if len(url_check.scheme) == 0 or len(url_check.netloc) == 0:
-            logging.error(
-                'Malformed file spec (source missing or invalid, in source "{}")\nObject: {}'.format(
-                    fs_copy["source"], pprint.pformat(file_spec, depth=1, indent=4)
-                )
-            )
-            return file_obj
+        source = fs_copy["source"]
+        # e.g. "source: null" or a number; there's no URL to match then
+        source_valid = isinstance(source, str) and _URL_RE.match(source) is not None
+
+    return resource_cls, fs_copy, derived, checksum, source_valid
+
+
+def parse_resource_spec(
+    name: str, file_spec: dict, parent: Subset
+) -> Optional[Resource]:
+    have_cached = _RESOURCE_TEMPLATES.get(id(file_spec))
+
+    if have_cached is not None and have_cached[0] is file_spec:
+        template = have_cached[1]
+    else:
+        template = compile_resource_spec(file_spec)
+
+        if len(_RESOURCE_TEMPLATES) >= RESOURCE_TEMPLATE_CACHE_SIZE:
+            _RESOURCE_TEMPLATES.clear()
+
+        _RESOURCE_TEMPLATES[id(file_spec)] = (file_spec, template)
+
+    resource_cls, fs_fields, derived, checksum, source_valid = template
+
+    file_obj: Optional[Resource] = None
+
+    # fields were checked against the class's schema when the spec was compiled
+    if resource_cls is StaticResource:
+        file_obj = StaticResource(
+            name=name,
+            path=_name_path(name),
+            **fs_fields,
+            parent=parent,
+            **derived,
+        )
+    elif resource_cls is DynamicResource:
+        file_obj = DynamicResource(
+            name=name,
+            path=None,
+            **fs_fields,
+            parent=parent,
+            **derived,
+        )
+
+    # checksum isn't a constructor field & already defaults to None, so it's only written for specs that set one
+    if file_obj is not None and checksum is not None:
+        file_obj.checksum = checksum
+
+    if not source_valid:
+        source = fs_fields["source"]
+        scheme = host = ""
+
+        # only parse the URL properly once it's known to be bad, to say what's missing
+        if isinstance(source, str):
+            url_check = urlparse(source)
+            scheme, host = url_check.scheme, url_check.netloc
+
+        logging.error(
+            'Malformed file spec (source missing or invalid, in source "%s"; scheme "%s", host "%s")\nObject: %s',
+            source,
+            scheme,
+            host,
+            SpecFormat(file_spec),
+        )
 
     return file_obj
 
 
+# one stat answers both "does it exist" & "is it a regular file", where exists() + isfile() would stat twice
+def is_regular_file(file_path: Path) -> bool:
+    try:
+        return S_ISREG(os.stat(file_path).st_mode)
+    except (OSError, ValueError):
+        return False
+
+
 def parse_datasource_file(
-    file_path: Path, data_context: DataContext
+    file_path: Path, data_context: DataContext, file_info: Optional[FileInfo] = None
 ) -> Optional[Dict[Any, Optional[Datasource]]]:
     datasources = {}
 
-    if exists(file_path) and isfile(file_path):
-        with open(file_path) as ds_file:
-            # try:
-            #     data_json = json.load(ds_file)
-            # except json.JSONDecodeError as e:
-            #     logging.error(
-            #         f"Provided datasource file ({file_path}) is not a JSON file, parse error follows: \n{e}"
-            #     )
-
-            #     return None
-
+    # a provided FileInfo means the caller has already established this is an existing file
+    if file_info is not None or is_regular_file(file_path):
+        # read as bytes; both parsers handle decoding themselves (and do it faster in C)
+        with open(file_path, "rb") as ds_file:
             try:
-                data_yml = yaml.load(ds_file)
-            except Exception as e:
-                bp()
+                # one read of the whole file; handed a file object, the loader would call back into Python's read() for every buffer it fills
+                ds_bytes = ds_file.read()
+
+                # routed on the extension alone; no need to build a Path just for its suffix
+                if str(file_path).endswith(".json"):
+                    data_yml = json_loads(ds_bytes)
+                else:
+                    data_yml = yaml.load(ds_bytes, Loader=YamlLoader)
+            except (yaml.YAMLError, ValueError) as e:
+                # JSON decode errors (json's & orjson's) are ValueErrors
+                logging.error(f'Failed to load datasource file "{file_path}": {e}')
+                return None
+
+            # the top level maps datasource names to their specs; an empty file loads as None, & a list or scalar isn't a set of datasources either
+            if not isinstance(data_yml, dict):
+                logging.error(
+                    f'Datasource file "{file_path}" should map datasource names to specs, but holds {type(data_yml).__name__}'
+                )
+                return None
 
             for name, ds_json in data_yml.items():
                 ds_spec = parse_datasource_spec(name, ds_json, None, data_context)
                 datasources[name] = ds_spec
 
+        # templates only pay off within a file (that's where aliased blocks live), & they hold on to the file's specs
+        clear_resource_templates()
+
     else:
 
         logging.error(
@@ -315,34 +567,107 @@ def parse_datasource_file(
     return datasources
 
 
-def datasources_from_dir(ds_dir: Path, data_dir: Path) -> Optional[DataCollection]:
+# module-level (rather than a closure) so it can be pickled over to pool workers
+def _parse_one(
+    file_info: FileInfo, data_context: DataContext
+) -> Optional[DataCollection]:
+    return parse_datasource_file(file_info.path, data_context, file_info=file_info)
 
-    datasources = {}
 
-    def join_ds(fp, ds, ctx):
-        parsed_ds = parse_datasource_file(fp, ctx)
+# yields each file's parse result (in input order) as soon as it's ready, so callers can start working with the first files while the rest are still parsing; with parallel, large enough batches are parsed across a process pool, whose workers import the caller's __main__ module, so scripts that turn it on need an `if __name__ == "__main__":` guard
+def iter_parse_datasource_files(
+    file_infos: List[FileInfo], data_context: DataContext, parallel: bool = False
+) -> Iterator[Optional[DataCollection]]:
 
-        if parsed_ds is not None:
-            return {**ds, **parsed_ds}
-        else:
-            return False
+    workers = min(len(file_infos), os.cpu_count() or 1)
 
-    d_ctx = DataContext(root_path=data_dir)
+    if (
+        not parallel
+        or workers < 2
+        or len(file_infos) < PARALLEL_PARSE_MIN_FILES
+        or sum(info.size for info in file_infos) < PARALLEL_PARSE_MIN_BYTES
+    ):
+        for info in file_infos:
+            yield _parse_one(info, data_context)
 
-    if exists(ds_dir) and isdir(ds_dir):
-        ds_dir_files = glob(join(ds_dir, "*.yml"))
-        logging.info(f"Found files in provided path({ds_dir}): {ds_dir_files}")
+        return
 
-        for ds_file_path in ds_dir_files:
-            # = parse_datasource_file(ds_path)
-            datasources = join_ds(ds_file_path, datasources, d_ctx)
+    # hand files to workers in batches to cut per-file IPC round trips, but never so large a batch that some workers are left idle
+    chunksize = max(1, min(PARALLEL_PARSE_CHUNKSIZE, len(file_infos) // workers))
 
-        # print("have datasources")
-        # bp()
-    else:
+    # workers are started fresh (forkserver, or spawn where that's unavailable) rather than forked: callers may already have download threads running, & forking a process mid-way through another thread's lock (logging, the HTTP pool, ...) can leave the child deadlocked
+    start_method = (
+        "forkserver"
+        if "forkserver" in multiprocessing.get_all_start_methods()
+        else "spawn"
+    )
+
+    # parsing is CPU-bound (mostly YAML) and each file parses independently, so fan it out across processes rather than threads to get around the GIL
+    with ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context(start_method)
+    ) as pool:
+        yield from pool.map(
+            _parse_one, file_infos, repeat(data_context), chunksize=chunksize
+        )
+
+
+def parse_datasource_files(
+    file_infos: List[FileInfo], data_context: DataContext, parallel: bool = False
+) -> List[Optional[DataCollection]]:
+    return list(
+        iter_parse_datasource_files(file_infos, data_context, parallel=parallel)
+    )
+
+
+# bulk metadata prefetch for a datasource directory, keyed by absolute file path; one scandir pass answers existence, file type, size and mtime for every datasource file (is_file() is served from the dirent type)
+def prefetch_metadata(ds_dir: Path) -> Optional[Dict[str, FileInfo]]:
+    try:
+        with os.scandir(ds_dir) as ds_dir_entries:
+            return {
+                abspath(entry.path): FileInfo.from_dir_entry(entry)
+                for entry in ds_dir_entries
+                if entry.name.endswith(DATASOURCE_FILE_SUFFIXES) and entry.is_file()
+            }
+    except (FileNotFoundError, NotADirectoryError):
         logging.error(
-            f'Provided datasource file path does not exist or is not a file: "{ds_file_path}"'
+            f'Provided datasource directory does not exist or is not a directory: "{ds_dir}"'
         )
-        return False
+        return None
+
+
+# files are parsed in this process unless parallel is set (see iter_parse_datasource_files() for what that asks of the calling script)
+def datasources_from_dir(
+    ds_dir: Path,
+    data_dir: Path,
+    parse_fn: Optional[
+        Callable[[List[FileInfo], DataContext], List[Optional[DataCollection]]]
+    ] = None,
+    metadata: Optional[Dict[str, FileInfo]] = None,
+    parallel: bool = False,
+) -> Optional[DataCollection]:
+
+    if parse_fn is None:
+        parse_fn = partial(parse_datasource_files, parallel=parallel)
+
+    datasources = {}
+
+    d_ctx = DataContext(root_path=data_dir)
+
+    # callers that already scanned the directory pass the result in, rather than scanning it again
+    if metadata is None:
+        metadata = prefetch_metadata(ds_dir)
+
+        if metadata is None:
+            return False
+
+    ds_dir_files = list(metadata.values())
+
+    logging.info(
+        f"Found files in provided path({ds_dir}): {[str(info.path) for info in ds_dir_files]}"
+    )
+
+    for parsed_ds in parse_fn(ds_dir_files, d_ctx):
+        if parsed_ds is not None:
+            datasources.update(parsed_ds)
 
     return datasources
@@ -0,0 +1,160 @@
+import pytest
+
+import os
+import pickle
+from dataclasses import dataclass
+from pathlib import Path
+
+import datasourcer.bin.dscer as dscer_cli
+import datasourcer.datasourcer as dscer
+import datasourcer.marshalling as dscer_marshall
+
+SPEC = """
+OTHER:
+  description: 'second'
+  datasources: {}
+  datasets:
+    ds:
+      description: 'ds'
+      org:
+        type: LOCAL
+        create_type: STATIC
+        subsets: {}
+        resources:
+          a2:
+            file_type: CSV
+            retrieve_type: GET
+            create_type: STATIC
+            source: 'http://127.0.0.1/a.csv'
+            description: 'csv2'
+"""
+
+
+# a fresh, empty parse cache (as at the start of a run) that lives under tmp_path
+@pytest.fixture
+def parse_cache(tmp_path, monkeypatch):
+    cache_path = tmp_path / "cache" / "parse_cache.pkl"
+
+    monkeypatch.setattr(dscer_cli, "_parse_cache_path", cache_path)
+    new_run(monkeypatch)
+
+    return cache_path
+
+
+def new_run(monkeypatch):
+    monkeypatch.setattr(dscer_cli, "_parse_cache", None)
+    monkeypatch.setattr(dscer_cli, "_parse_cache_dirty", False)
+    monkeypatch.setattr(dscer_cli, "_parse_cache_seen", set())
+
+
+def no_parsing(file_path, *args, **kwargs):
+    raise AssertionError(f"parsed {file_path}, which should've come from the cache")
+
+
+def a2_path(parsed):
+    return parsed["OTHER"].datasets["ds"].org.resources["a2"].build_path()
+
+
+def test_parse_cache_round_trip(tmp_path, monkeypatch, parse_cache):
+    spec_path = tmp_path / "two.yml"
+    spec_path.write_text(SPEC)
+    ctx = dscer.DataContext(root_path=tmp_path / "data")
+
+    parsed = dscer_cli._cached_parse(spec_path, ctx)
+    dscer_cli._flush_parse_cache()
+
+    assert parse_cache.exists()
+
+    # the next run gets the same tree back from disk, without parsing
+    new_run(monkeypatch)
+    monkeypatch.setattr(dscer_marshall, "parse_datasource_file", no_parsing)
+
+    cached = dscer_cli._cached_parse(spec_path, ctx)
+
+    assert cached is not parsed
+    assert list(cached) == ["OTHER"]
+    assert a2_path(cached) == a2_path(parsed)
+
+
+def test_changed_file_is_parsed_again(tmp_path, monkeypatch, parse_cache):
+    spec_path = tmp_path / "two.yml"
+    spec_path.write_text(SPEC)
+    ctx = dscer.DataContext(root_path=tmp_path / "data")
+
+    dscer_cli._cached_parse(spec_path, ctx)
+    dscer_cli._flush_parse_cache()
+
+    spec_path.write_text(SPEC.replace("a2:", "renamed:"))
+
+    new_run(monkeypatch)
+    reparsed = dscer_cli._cached_parse(spec_path, ctx)
+
+    assert "renamed" in reparsed["OTHER"].datasets["ds"].org.resources
+
+
+def test_other_data_root_is_parsed_again(tmp_path, monkeypatch, parse_cache):
+    spec_path = tmp_path / "two.yml"
+    spec_path.write_text(SPEC)
+
+    dscer_cli._cached_parse(spec_path, dscer.DataContext(root_path=tmp_path / "a"))
+    parsed = dscer_cli._cached_parse(spec_path, dscer.DataContext(root_path=tmp_path / "b"))
+
+    assert (tmp_path / "b") in a2_path(parsed).parents
+
+
+def test_entries_for_removed_files_are_pruned(tmp_path, monkeypatch, parse_cache):
+    ctx = dscer.DataContext(root_path=tmp_path / "data")
+    kept_path = tmp_path / "kept.yml"
+    removed_path = tmp_path / "removed.yml"
+
+    for spec_path in (kept_path, removed_path):
+        spec_path.write_text(SPEC)
+        dscer_cli._cached_parse(spec_path, ctx)
+
+    dscer_cli._flush_parse_cache()
+
+    removed_path.unlink()
+    other_path = tmp_path / "other.yml"
+    other_path.write_text(SPEC)
+
+    # a run that only looks at another file; kept.yml is left alone as it still exists
+    new_run(monkeypatch)
+    dscer_cli._cached_parse(other_path, ctx)
+    dscer_cli._flush_parse_cache()
+
+    with open(parse_cache, "rb") as cache_file:
+        cached_paths = {path for path, _ in pickle.load(cache_file)}
+
+    assert cached_paths == {os.fspath(kept_path), os.fspath(other_path)}
+    assert [p.name for p in parse_cache.parent.iterdir()] == [parse_cache.name]
+
+
+# pickles of the old layout can't be loaded into the new classes, so a layout change moves to a fresh cache file
+def test_cache_file_follows_the_tree_layout(monkeypatch):
+    path = dscer_cli._get_parse_cache_path()
+
+    assert path.parent == dscer_cli._PARSE_CACHE_DIR
+    assert dscer_cli._tree_layout_digest() in path.name
+
+    @dscer.with_slots
+    @dataclass
+    class Resource(dscer.Resource):
+        added: int = 0
+
+    Resource.__module__ = dscer.__name__
+    monkeypatch.setattr(dscer, "Resource", Resource)
+    monkeypatch.setattr(dscer_cli, "_parse_cache_path", None)
+
+    assert dscer_cli._get_parse_cache_path() != path
+
+
+def test_unreadable_cache_is_ignored(tmp_path, parse_cache):
+    parse_cache.parent.mkdir(parents=True)
+    parse_cache.write_bytes(b"not a pickle")
+
+    spec_path = tmp_path / "two.yml"
+    spec_path.write_text(SPEC)
+
+    parsed = dscer_cli._cached_parse(spec_path, dscer.DataContext(root_path=Path("/data")))
+
+    assert "OTHER" in parsed
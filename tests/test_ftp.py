@@ -0,0 +1,66 @@
+import pytest
+
+import ftplib
+
+import datasourcer.datasourcer as dscer
+
+FILES = {"a.csv": 10, "b.zip": 2048}
+DIRS = {"sub"}
+
+
+# answers the listing commands ftp_list_files() uses, for a /pub dir holding FILES & DIRS
+class FakeFTP:
+    def __init__(self, mlsd: bool = True, full_paths: bool = False):
+        self.has_mlsd = mlsd
+        self.full_paths = full_paths
+        self.commands = []
+
+    def mlsd(self, path, facts=[]):
+        self.commands.append("MLSD")
+
+        if not self.has_mlsd:
+            raise ftplib.error_perm("500 Unknown command")
+
+        yield ".", {"type": "cdir"}
+
+        for name in DIRS:
+            yield name, {"type": "dir"}
+
+        for name, size in FILES.items():
+            yield name, {"type": "file", "size": str(size)}
+
+    def nlst(self, path):
+        self.commands.append("NLST")
+        names = sorted(set(FILES) | DIRS)
+
+        return [f"{path}/{name}" for name in names] if self.full_paths else names
+
+    def voidcmd(self, cmd):
+        self.commands.append(cmd)
+
+    def size(self, path):
+        self.commands.append("SIZE")
+        name = path.rsplit("/", 1)[-1]
+
+        if name not in FILES:
+            raise ftplib.error_perm("550 Not a plain file")
+
+        return FILES[name]
+
+
+EXPECTED = sorted((f"/pub/{name}", str(size)) for name, size in FILES.items())
+
+
+def test_files_are_listed_with_mlsd():
+    ftp = FakeFTP()
+
+    assert sorted(dscer.ftp_list_files(ftp, "/pub")) == EXPECTED
+    assert ftp.commands == ["MLSD"]
+
+
+@pytest.mark.parametrize("full_paths", [False, True])
+def test_listing_falls_back_to_nlst_without_mlsd(full_paths):
+    ftp = FakeFTP(mlsd=False, full_paths=full_paths)
+
+    assert sorted(dscer.ftp_list_files(ftp, "/pub")) == EXPECTED
+    assert ftp.commands[:3] == ["MLSD", "NLST", "TYPE I"]
@@ -0,0 +1,90 @@
+import pytest
+
+import os
+import stat
+
+import datasourcer.datasourcer as dscer
+
+
+@pytest.mark.parametrize(
+    "size_bytes, expected",
+    [
+        (0, "0B"),
+        # e.g. a negative Content-Length
+        (-1, "0B"),
+        (1, "1.0 B"),
+        (1023, "1023.0 B"),
+        (1024, "1.0 KB"),
+        (1536, "1.5 KB"),
+        (1 << 20, "1.0 MB"),
+        ((1 << 20) - 1, "1024.0 KB"),
+        (5 << 40, "5.0 TB"),
+        # past the largest unit, sizes are given in that unit
+        (1 << 90, "1024.0 YB"),
+    ],
+)
+def test_convert_size(size_bytes, expected):
+    assert dscer.convert_size(size_bytes) == expected
+
+
+@pytest.mark.parametrize("reload_unconfirmable", [True, False])
+@pytest.mark.parametrize(
+    "exists, is_valid, expected",
+    [
+        (False, True, True),
+        (False, False, True),
+        (False, None, True),
+        (True, True, False),
+        (True, False, True),
+    ],
+)
+def test_validation_policy(exists, is_valid, reload_unconfirmable, expected):
+    assert (
+        dscer.check_validation_policy(
+            exists, is_valid, reload_unconfirmable=reload_unconfirmable
+        )
+        is expected
+    )
+
+
+# existing files that can't be checked are only downloaded again if asked to
+@pytest.mark.parametrize("reload_unconfirmable", [True, False])
+def test_validation_policy_for_unconfirmable_files(reload_unconfirmable):
+    assert (
+        dscer.check_validation_policy(
+            True, None, reload_unconfirmable=reload_unconfirmable
+        )
+        is reload_unconfirmable
+    )
+
+
+def test_validation_policy_covers_every_case():
+    assert set(dscer._VALIDATION_POLICY) == {
+        (exists, is_valid, reload)
+        for exists in (True, False)
+        for is_valid in (True, False, None)
+        for reload in (True, False)
+    }
+
+
+def test_write_file_atomic(tmp_path):
+    path = tmp_path / "out.bin"
+    path.write_bytes(b"old")
+
+    dscer.write_file_atomic(path, b"new")
+
+    assert path.read_bytes() == b"new"
+    # the usual mode for a new file, rather than mkstemp()'s owner-only one
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o666 & ~dscer._UMASK
+    assert [p.name for p in tmp_path.iterdir()] == ["out.bin"]
+
+
+def test_failed_atomic_write_leaves_the_file_alone(tmp_path):
+    path = tmp_path / "out.bin"
+    path.write_bytes(b"old")
+
+    with pytest.raises(TypeError):
+        dscer.write_file_atomic(path, "not bytes")
+
+    assert path.read_bytes() == b"old"
+    assert [p.name for p in tmp_path.iterdir()] == ["out.bin"]
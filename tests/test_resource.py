@@ -1 +1,395 @@
 import pytest
+
+import hashlib
+import json
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import requests
+
+import datasourcer.bin.dscer as dscer_cli
+import datasourcer.datasourcer as dscer
+import datasourcer.marshalling as dscer_marshall
+
+
+# serves a single file (body & ETag can be swapped out mid-test), with HEAD, Range & If-Range support; every request's method & headers are kept for the tests to look at
+class FileServer:
+    def __init__(self, body: bytes, etag: str):
+        self.body = body
+        self.etag = etag
+        self.head_status = 200
+        self.requests = []
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_HEAD(self):
+                server.requests.append(("HEAD", dict(self.headers)))
+                self.send_file_headers(server.head_status, len(server.body))
+
+            def do_GET(self):
+                server.requests.append(("GET", dict(self.headers)))
+
+                if self.path != "/data.csv":
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+
+                body = server.body
+                range_header = self.headers.get("Range")
+                if_range = self.headers.get("If-Range")
+
+                # a stale If-Range gets the whole (current) file
+                if range_header is not None and if_range in (None, server.etag):
+                    start = int(range_header[len("bytes="):-1])
+
+                    if start >= len(body):
+                        self.send_response(416)
+                        self.send_header("Content-Range", f"bytes */{len(body)}")
+                        self.send_header("Content-Length", "0")
+                        self.end_headers()
+                        return
+
+                    self.send_file_headers(
+                        206,
+                        len(body) - start,
+                        {"Content-Range": f"bytes {start}-{len(body) - 1}/{len(body)}"},
+                    )
+                    self.wfile.write(body[start:])
+                    return
+
+                self.send_file_headers(200, len(body))
+                self.wfile.write(body)
+
+            def send_file_headers(self, status, length, extra=None):
+                self.send_response(status)
+                self.send_header("Content-Length", str(length))
+                self.send_header("Accept-Ranges", "bytes")
+                self.send_header("ETag", server.etag)
+
+                for key, value in (extra or {}).items():
+                    self.send_header(key, value)
+
+                self.end_headers()
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}/data.csv"
+
+    def gets(self):
+        return [headers for method, headers in self.requests if method == "GET"]
+
+
+@pytest.fixture
+def server():
+    file_server = FileServer(b"0123456789" * 1000, '"v1"')
+    thread = threading.Thread(target=file_server.httpd.serve_forever, daemon=True)
+    thread.start()
+
+    yield file_server
+
+    file_server.httpd.shutdown()
+    file_server.httpd.server_close()
+
+
+def dataset_spec(source: str, retrieve_type: str = "GET") -> dict:
+    return {
+        "description": "ds",
+        "org": {
+            "type": "LOCAL",
+            "create_type": "STATIC",
+            "subsets": {},
+            "resources": {
+                "data_csv": {
+                    "file_type": "CSV",
+                    "retrieve_type": retrieve_type,
+                    "create_type": "STATIC",
+                    "source": source,
+                    "description": "data",
+                }
+            },
+        },
+    }
+
+
+def parse_spec(tmp_path: Path, datasets: dict) -> dscer.Datasource:
+    spec = {"T": {"description": "t", "datasources": {}, "datasets": datasets}}
+
+    spec_path = tmp_path / "spec.json"
+    spec_path.write_text(json.dumps(spec))
+
+    ctx = dscer.DataContext(root_path=tmp_path / "data")
+
+    return dscer_marshall.parse_datasource_file(spec_path, ctx)["T"]
+
+
+def parse_resource(tmp_path: Path, source: str) -> dscer.Resource:
+    datasource = parse_spec(tmp_path, {"ds": dataset_spec(source)})
+
+    return datasource.datasets["ds"].org.resources["data_csv"]
+
+
+# a local file, as left behind by an interrupted download
+def write_partial(resource: dscer.Resource, data: bytes) -> Path:
+    file_path = resource.build_path()
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+    file_path.write_bytes(data)
+
+    return file_path
+
+
+def test_download_is_recorded_and_then_skipped(tmp_path, server):
+    resource = parse_resource(tmp_path, server.url)
+
+    assert resource.download()
+    assert resource.build_path().read_bytes() == server.body
+
+    manifest = dscer.get_manifest(resource.build_parent_path())
+    assert manifest.is_unchanged(resource.build_path(), server.url, None)
+    assert manifest.resume_validator(resource.build_path(), server.url) == '"v1"'
+
+    server.requests.clear()
+
+    # unchanged since it was recorded, so not even a HEAD (from a new node for the same spec, as on a later run)
+    assert parse_resource(tmp_path, server.url).download()
+    assert server.requests == []
+
+
+def test_manifest_round_trips_through_flush(tmp_path, server):
+    resource = parse_resource(tmp_path, server.url)
+    assert resource.download()
+
+    dscer.flush_manifests()
+
+    reloaded = dscer.DownloadManifest(resource.build_parent_path())
+    assert reloaded.is_unchanged(resource.build_path(), server.url, None)
+
+
+def test_touched_file_is_not_unchanged(tmp_path, server):
+    resource = parse_resource(tmp_path, server.url)
+    assert resource.download()
+
+    resource.build_path().write_bytes(b"edited")
+
+    manifest = dscer.get_manifest(resource.build_parent_path())
+    assert not manifest.is_unchanged(resource.build_path(), server.url, None)
+
+
+def test_partial_download_resumes_with_if_range(tmp_path, server):
+    resource = parse_resource(tmp_path, server.url)
+    file_path = write_partial(resource, server.body[:4000])
+
+    manifest = dscer.get_manifest(resource.build_parent_path())
+    manifest.begin(file_path, server.url, etag='"v1"')
+
+    assert resource.download()
+    assert file_path.read_bytes() == server.body
+
+    (get,) = server.gets()
+    assert get["Range"] == "bytes=4000-"
+    assert get["If-Range"] == '"v1"'
+
+    assert manifest.is_unchanged(file_path, server.url, None)
+
+
+def test_partial_download_of_changed_file_restarts(tmp_path, server):
+    resource = parse_resource(tmp_path, server.url)
+    file_path = write_partial(resource, server.body[:4000])
+
+    manifest = dscer.get_manifest(resource.build_parent_path())
+    manifest.begin(file_path, server.url, etag='"v1"')
+
+    server.body = b"abcdefghij" * 1200
+    server.etag = '"v2"'
+
+    assert resource.download()
+    assert file_path.read_bytes() == server.body
+    assert manifest.resume_validator(file_path, server.url) == '"v2"'
+
+
+def test_partial_download_without_validator_is_fetched_whole(tmp_path, server):
+    resource = parse_resource(tmp_path, server.url)
+    file_path = write_partial(resource, b"not from this server")
+
+    assert resource.download()
+    assert file_path.read_bytes() == server.body
+
+    (get,) = server.gets()
+    assert "Range" not in get
+
+
+# an error response to the HEAD can carry headers of its own, which aren't the file's
+def test_failed_head_leaves_the_size_unknown(tmp_path, server):
+    resource = parse_resource(tmp_path, server.url)
+    file_path = write_partial(resource, server.body[:4000])
+
+    manifest = dscer.get_manifest(resource.build_parent_path())
+    manifest.begin(file_path, server.url, etag='"v1"')
+
+    server.head_status = 503
+
+    # the local file can't be checked against anything, so it's fetched again whole rather than resumed
+    assert resource.download(reload_unconfirmable=True)
+    assert resource.fetch_remote_size() is None
+    assert file_path.read_bytes() == server.body
+
+    (get,) = server.gets()
+    assert "Range" not in get
+
+
+def test_range_past_the_end_means_complete(tmp_path, server):
+    file_path = tmp_path / "data.csv"
+    file_path.write_bytes(server.body)
+
+    headers = dscer.get_chunked(
+        server.url, file_path, resume_from=len(server.body), if_range='"v1"'
+    )
+
+    assert headers is not None
+    assert file_path.read_bytes() == server.body
+
+
+# downloads run side by side, so each line has to say which file it's about
+def test_download_log_lines_name_the_file(tmp_path, caplog, server):
+    resource = parse_resource(tmp_path, server.url)
+
+    with caplog.at_level(logging.INFO):
+        assert resource.download()
+
+    file_path = resource.build_path()
+    assert f"{file_path}: File size is" in caplog.text
+    assert f"{file_path}: {dscer.convert_size(len(server.body))}" in caplog.text
+
+
+def test_complete_file_is_not_downloaded_again(tmp_path, server):
+    resource = parse_resource(tmp_path, server.url)
+    write_partial(resource, server.body)
+
+    resource.download()
+    assert server.gets() == []
+
+
+def test_subtrees_with_nothing_to_retrieve_are_skipped(tmp_path, monkeypatch, server):
+    datasource = parse_spec(
+        tmp_path,
+        {"files": dataset_spec(server.url), "layout": dataset_spec(server.url, "NONE")},
+    )
+    files = datasource.datasets["files"]
+    layout = datasource.datasets["layout"]
+
+    assert files.has_retrievable()
+    assert not layout.has_retrievable()
+
+    walked = []
+    get_traversable_children = dscer.Dataset.get_traversable_children
+
+    def recording_children(self):
+        walked.append(self.name)
+        return get_traversable_children(self)
+
+    monkeypatch.setattr(dscer.Dataset, "get_traversable_children", recording_children)
+
+    assert dscer.download_leaves(datasource)
+
+    assert walked == ["files"]
+    assert files.org.resources["data_csv"].build_path().exists()
+    assert not layout.org.resources["data_csv"].build_path().exists()
+    assert len(server.gets()) == 1
+
+
+# overlapping qualifiers (e.g. a dataset & one of its files) reach the same leaves more than once
+def test_leaves_are_only_submitted_once(tmp_path, server):
+    datasource = parse_spec(tmp_path, {"ds": dataset_spec(server.url)})
+    resource = datasource.datasets["ds"].org.resources["data_csv"]
+    seen = set()
+
+    ((leaf, future),) = dscer.submit_leaf_downloads(datasource, seen=seen)
+    assert dscer.submit_leaf_downloads(resource, seen=seen) == []
+
+    assert leaf is resource
+    assert future.result()
+    assert len(server.gets()) == 1
+
+
+def test_failed_download_is_neither_written_nor_recorded(tmp_path, server):
+    resource = parse_resource(tmp_path, server.url.replace("data.csv", "missing.csv"))
+
+    with pytest.raises(requests.HTTPError):
+        resource.download()
+
+    manifest = dscer.get_manifest(resource.build_parent_path())
+    assert not resource.build_path().exists()
+    assert manifest.resume_validator(resource.build_path(), resource.source) is None
+
+
+def test_checksum_mismatch_is_not_recorded(tmp_path, server):
+    resource = parse_resource(tmp_path, server.url)
+    resource.checksum = "sha256:" + hashlib.sha256(b"something else").hexdigest()
+
+    assert not resource.download()
+
+    manifest = dscer.get_manifest(resource.build_parent_path())
+    assert not manifest.is_unchanged(resource.build_path(), server.url, resource.checksum)
+
+
+def failing_datasource(tmp_path, server):
+    missing_url = server.url.replace("data.csv", "missing.csv")
+    datasource = parse_spec(
+        tmp_path,
+        {
+            "good": dataset_spec(server.url),
+            "missing": dataset_spec(missing_url),
+            "mismatched": dataset_spec(server.url),
+        },
+    )
+
+    mismatched = datasource.datasets["mismatched"].org.resources["data_csv"]
+    mismatched.checksum = "sha256:" + hashlib.sha256(b"something else").hexdigest()
+
+    return datasource
+
+
+# one failed leaf (an error response, or a body that doesn't check out) doesn't stop the rest from being downloaded & recorded
+def test_failed_leaves_are_reported_after_the_rest(tmp_path, caplog, server):
+    datasource = failing_datasource(tmp_path, server)
+    good = datasource.datasets["good"].org.resources["data_csv"]
+
+    with caplog.at_level(logging.ERROR):
+        assert not dscer.download_leaves(datasource)
+
+    assert good.build_path().read_bytes() == server.body
+
+    reloaded = dscer.DownloadManifest(good.build_parent_path())
+    assert reloaded.is_unchanged(good.build_path(), server.url, None)
+
+    for name in ("missing", "mismatched"):
+        path = datasource.datasets[name].org.resources["data_csv"].build_path()
+        assert f'Failed to retrieve "{path}"' in caplog.text
+
+
+def test_cli_run_with_failed_downloads_fails(tmp_path, monkeypatch, server):
+    monkeypatch.setattr(dscer_cli, "_parse_cache_path", tmp_path / "parse_cache.pkl")
+    monkeypatch.setattr(dscer_cli, "_parse_cache", None)
+    monkeypatch.setattr(dscer_cli, "_parse_cache_dirty", False)
+    monkeypatch.setattr(dscer_cli, "_parse_cache_seen", set())
+
+    failing_datasource(tmp_path, server)
+    spec_dir = tmp_path / "specs"
+    spec_dir.mkdir()
+    (tmp_path / "spec.json").rename(spec_dir / "spec.json")
+
+    args = ["-dd", str(tmp_path / "data"), "-dsd", str(spec_dir), "-dl"]
+
+    assert not dscer_cli.process_args(dscer_cli._PARSER.parse_args(args))
+    assert (tmp_path / "data" / "T" / "good" / "data" / "data_csv").exists()
+
+    with pytest.raises(SystemExit) as exit_info:
+        monkeypatch.setattr("sys.argv", ["dscer"] + args)
+        dscer_cli.run()
+
+    assert exit_info.value.code == 1
@@ -0,0 +1,335 @@
+import pytest
+
+import logging
+import os
+import pickle
+from pathlib import Path
+
+import datasourcer.datasourcer as dscer
+import datasourcer.marshalling as dscer_marshall
+
+SPEC = """
+TEST:
+  description: 'testing datasource'
+  datasets:
+    test_dataset:
+      description: 'TEST.test_dataset'
+      org:
+        type: LOCAL
+        create_type: STATIC
+        subsets:
+          inner:
+            type: LOCAL
+            create_type: STATIC
+            subsets: {}
+            resources:
+              c_kml:
+                file_type: KML
+                retrieve_type: GET
+                create_type: STATIC
+                source: 'http://127.0.0.1/c.kml'
+                description: 'kml'
+          remote:
+            type: REMOTE
+            create_type: STATIC
+            retrieve_type: FTP
+            source: 'ftp://127.0.0.1/pub'
+        resources:
+          a_csv:
+            file_type: CSV
+            retrieve_type: GET
+            create_type: STATIC
+            source: 'http://127.0.0.1/a.csv'
+            description: 'csv'
+  datasources:
+    sub:
+      description: 'TEST.sub'
+      datasources: {}
+      datasets:
+        other:
+          description: 'other'
+          org:
+            type: LOCAL
+            create_type: STATIC
+            subsets: {}
+            resources:
+              b_json:
+                file_type: JSON
+                retrieve_type: GET
+                create_type: STATIC
+                source: 'http://127.0.0.1/b.json'
+                description: 'json'
+"""
+
+
+def parse(tmp_path: Path, text: str, name: str = "spec.yml"):
+    spec_path = tmp_path / name
+    spec_path.write_text(text)
+
+    ctx = dscer.DataContext(root_path=tmp_path / "data")
+
+    return dscer_marshall.parse_datasource_file(spec_path, ctx)
+
+
+def test_children_are_built_at_parse_time(tmp_path):
+    spec = parse(tmp_path, SPEC)
+
+    org = spec["TEST"].datasets["test_dataset"].org
+    inner = org.subsets["inner"]
+    c_kml = inner.resources["c_kml"]
+
+    assert isinstance(inner, dscer.Subset)
+    assert isinstance(org.subsets["remote"], dscer.RemoteSubset)
+    assert isinstance(c_kml, dscer.StaticResource)
+    assert c_kml.parent is inner
+    # a dataset's files go under its org subset's "data" dir
+    assert c_kml.build_path() == (
+        tmp_path / "data" / "TEST" / "test_dataset" / "data" / "inner" / "c_kml"
+    )
+
+
+def test_dynamic_resource_without_snapshots_yet(tmp_path):
+    text = SPEC.replace(
+        "        resources:\n          a_csv:\n",
+        "        resources:\n"
+        "          live_csv:\n"
+        "            file_type: CSV\n"
+        "            retrieve_type: GET\n"
+        "            create_type: DYNAMIC\n"
+        "            source: 'http://127.0.0.1/live.csv'\n"
+        "            description: 'live'\n"
+        "          a_csv:\n",
+    )
+
+    spec = parse(tmp_path, text)
+    live_csv = spec["TEST"].datasets["test_dataset"].org.resources["live_csv"]
+
+    # the snapshot dir doesn't exist until something is downloaded
+    assert live_csv.snapshots == []
+    assert live_csv.get_latest_snapshot() is None
+
+    snapshot_dir = live_csv.build_parent_path()
+    snapshot_dir.mkdir(parents=True)
+
+    for stamp in ["2021_03_04_0500", "2020_01_02_0300"]:
+        (snapshot_dir / f"live_csv.{stamp}.csv").write_text("x")
+
+    _, latest = live_csv.update_snapshots()[-1]
+    assert latest == snapshot_dir / "live_csv.2021_03_04_0500.csv"
+
+
+def test_pickled_tree_leaves_out_caches_and_head_results(tmp_path):
+    spec = parse(tmp_path, SPEC)
+
+    c_kml = spec["TEST"].datasets["test_dataset"].org.subsets["inner"].resources["c_kml"]
+    path = c_kml.build_path()
+    assert spec["TEST"].has_retrievable()
+
+    c_kml._remote_checked = True
+    c_kml._remote_size = 5
+
+    loaded = pickle.loads(pickle.dumps(spec))
+    loaded_kml = (
+        loaded["TEST"].datasets["test_dataset"].org.subsets["inner"].resources["c_kml"]
+    )
+
+    assert not hasattr(loaded_kml, "_cached_path")
+    assert not hasattr(loaded["TEST"], "_has_retrievable")
+    assert not loaded_kml._remote_checked
+    assert loaded_kml._remote_size is None
+
+    assert loaded_kml.build_path() == path
+    assert loaded_kml.parent.parent.parent.parent is loaded["TEST"]
+
+
+@pytest.mark.parametrize("source", ["null", "5", "'not a url'"])
+def test_invalid_source_is_logged_and_kept(tmp_path, caplog, source):
+    text = SPEC.replace("source: 'http://127.0.0.1/c.kml'", f"source: {source}")
+
+    with caplog.at_level(logging.ERROR):
+        spec = parse(tmp_path, text)
+
+    inner = spec["TEST"].datasets["test_dataset"].org.subsets["inner"]
+    assert "c_kml" in inner.resources
+    assert "source missing or invalid" in caplog.text
+
+
+def test_malformed_resource_fails_at_parse_time(tmp_path, caplog):
+    text = SPEC.replace("                file_type: KML\n", "")
+
+    with caplog.at_level(logging.ERROR):
+        with pytest.raises(ValueError):
+            parse(tmp_path, text)
+
+    assert "Malformed file spec" in caplog.text
+
+
+def test_unknown_remote_retrieve_type_drops_the_subset(tmp_path, caplog):
+    text = SPEC.replace("retrieve_type: FTP", "retrieve_type: BOGUS")
+
+    with caplog.at_level(logging.ERROR):
+        spec = parse(tmp_path, text)
+
+    assert spec["TEST"].datasets["test_dataset"].org.subsets["remote"] is None
+    assert "'BOGUS' is not a valid RetrieveType" in caplog.text
+
+
+def test_manual_remote_subset_download_is_a_no_op(tmp_path):
+    spec = parse(tmp_path, SPEC.replace("retrieve_type: FTP", "retrieve_type: MANUAL"))
+    remote = spec["TEST"].datasets["test_dataset"].org.subsets["remote"]
+
+    assert remote.download()
+
+
+def test_invalid_resource_enum_fails_at_parse_time(tmp_path, caplog):
+    text = SPEC.replace("file_type: KML", "file_type: KMZ")
+
+    with caplog.at_level(logging.ERROR):
+        with pytest.raises(ValueError):
+            parse(tmp_path, text)
+
+    assert "Malformed file spec" in caplog.text
+
+
+def test_subset_without_type_is_skipped(tmp_path, caplog):
+    text = SPEC.replace(
+        "          inner:\n            type: LOCAL\n", "          inner:\n"
+    )
+
+    with caplog.at_level(logging.ERROR):
+        spec = parse(tmp_path, text)
+
+    org = spec["TEST"].datasets["test_dataset"].org
+    assert org.subsets["inner"] is None
+    assert "a_csv" in org.resources
+    assert "missing its 'type'" in caplog.text
+
+
+@pytest.mark.parametrize(
+    "name, text",
+    [("broken.yml", "TEST: [unclosed\n"), ("broken.json", '{"TEST": ')],
+)
+def test_undecodable_file_parses_to_none(tmp_path, caplog, name, text):
+    with caplog.at_level(logging.ERROR):
+        assert parse(tmp_path, text, name=name) is None
+
+    assert "Failed to load datasource file" in caplog.text
+
+
+@pytest.mark.parametrize("text", ["", "- a\n- b\n", "just a string\n"])
+def test_non_mapping_file_is_rejected(tmp_path, caplog, text):
+    with caplog.at_level(logging.ERROR):
+        assert parse(tmp_path, text) is None
+
+    assert "should map datasource names to specs" in caplog.text
+
+
+# counts the process pools parse_datasource_files() starts
+@pytest.fixture
+def pools(monkeypatch):
+    started = []
+    process_pool = dscer_marshall.ProcessPoolExecutor
+
+    def counting_pool(*args, **kwargs):
+        started.append(kwargs.get("max_workers"))
+        return process_pool(*args, **kwargs)
+
+    monkeypatch.setattr(dscer_marshall, "ProcessPoolExecutor", counting_pool)
+
+    return started
+
+
+def write_specs(tmp_path, count: int):
+    spec_dir = tmp_path / "specs"
+    spec_dir.mkdir()
+
+    for i in range(count):
+        (spec_dir / f"spec_{i}.yml").write_text(SPEC.replace("TEST:", f"TEST_{i}:"))
+
+    return sorted(
+        dscer_marshall.prefetch_metadata(spec_dir).values(), key=lambda info: info.path
+    )
+
+
+@pytest.mark.parametrize(
+    "parallel, cpus, min_bytes",
+    [
+        # library callers only get the pool if they ask for it
+        (False, 4, 0),
+        # no second core to parse on
+        (True, 1, 0),
+        # too little to parse to be worth starting the pool
+        (True, 4, dscer_marshall.PARALLEL_PARSE_MIN_BYTES),
+    ],
+)
+def test_files_are_parsed_in_process(
+    tmp_path, monkeypatch, pools, parallel, cpus, min_bytes
+):
+    monkeypatch.setattr(os, "cpu_count", lambda: cpus)
+    monkeypatch.setattr(dscer_marshall, "PARALLEL_PARSE_MIN_BYTES", min_bytes)
+
+    file_infos = write_specs(tmp_path, 3)
+    ctx = dscer.DataContext(root_path=tmp_path / "data")
+
+    parsed = dscer_marshall.parse_datasource_files(file_infos, ctx, parallel=parallel)
+
+    assert [list(p) for p in parsed] == [["TEST_0"], ["TEST_1"], ["TEST_2"]]
+    assert pools == []
+
+
+def test_files_are_parsed_across_a_process_pool(tmp_path, monkeypatch, pools):
+    monkeypatch.setattr(os, "cpu_count", lambda: 2)
+    monkeypatch.setattr(dscer_marshall, "PARALLEL_PARSE_MIN_BYTES", 0)
+
+    write_specs(tmp_path, 3)
+
+    datasources = dscer_marshall.datasources_from_dir(
+        tmp_path / "specs", tmp_path / "data", parallel=True
+    )
+
+    assert sorted(datasources) == ["TEST_0", "TEST_1", "TEST_2"]
+    assert pools == [2]
+
+
+@pytest.mark.parametrize(
+    "qualifier, name",
+    [
+        ("test", "TEST"),
+        ("TEST.test_dataset", "test_dataset"),
+        ("test.test_dataset.inner.c_kml", "c_kml"),
+        ("Test.Sub.Other.B_JSON", "b_json"),
+        ("test.test_dataset.remote", "remote"),
+    ],
+)
+def test_retrieve_by_qualifier(tmp_path, qualifier, name):
+    spec = parse(tmp_path, SPEC)
+    flat_index = dscer.build_flat_index(spec)
+
+    node = dscer.retrieve_by_qualifier(spec, qualifier)
+
+    assert node is not None
+    assert node.name == name
+    assert dscer.retrieve_by_qualifier(spec, qualifier, flat_index=flat_index) is node
+
+
+@pytest.mark.parametrize(
+    "qualifier",
+    ["nope", "test.nope", "test.test_dataset.a_csv.deeper", "test.test_dataset.remote.x"],
+)
+def test_unresolvable_qualifier(tmp_path, qualifier):
+    spec = parse(tmp_path, SPEC)
+
+    assert dscer.retrieve_by_qualifier(spec, qualifier) is None
+    assert (
+        dscer.retrieve_by_qualifier(
+            spec, qualifier, flat_index=dscer.build_flat_index(spec)
+        )
+        is None
+    )
+
+
+def test_match_case_qualifier(tmp_path):
+    spec = parse(tmp_path, SPEC)
+
+    assert dscer.retrieve_by_qualifier(spec, "TEST.sub", match_case=True) is not None
+    assert dscer.retrieve_by_qualifier(spec, "test.sub", match_case=True) is None
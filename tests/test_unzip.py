@@ -0,0 +1,84 @@
+import logging
+import threading
+
+from types import SimpleNamespace
+from zipfile import ZipFile
+
+import pytest
+
+import datasourcer.datasourcer as dscer
+
+ENTRIES = {
+    "a.csv": b"a,b\n1,2\n",
+    "nested/b.json": b'{"b": 1}',
+}
+
+
+def zip_resource(tmp_path, entries):
+    zf_path = tmp_path / "archive.zip"
+
+    with ZipFile(zf_path, "w") as zf:
+        for name, data in entries.items():
+            zf.writestr(name, data)
+
+    return SimpleNamespace(
+        build_path=lambda: zf_path, build_parent_path=lambda: tmp_path
+    )
+
+
+# records the thread each entry was extracted on
+@pytest.fixture
+def extracted_on(monkeypatch):
+    threads = {}
+    extract_zip_entry = dscer.extract_zip_entry
+
+    def recording_extract(zf, info, target):
+        threads[info.filename] = threading.current_thread()
+        extract_zip_entry(zf, info, target)
+
+    monkeypatch.setattr(dscer, "extract_zip_entry", recording_extract)
+
+    return threads
+
+
+def test_entries_are_extracted_into_the_unzip_dir(tmp_path, extracted_on):
+    resource = zip_resource(tmp_path, ENTRIES)
+
+    assert dscer.ZipfileProcessor("out").process(resource)
+
+    for name, data in ENTRIES.items():
+        assert (tmp_path / "out" / name).read_bytes() == data
+
+    # a small archive is extracted in place
+    assert set(extracted_on.values()) == {threading.current_thread()}
+
+
+def test_large_archives_are_extracted_on_worker_threads(
+    tmp_path, monkeypatch, extracted_on
+):
+    monkeypatch.setattr(dscer, "PARALLEL_UNZIP_MIN_BYTES", 0)
+
+    entries = {f"part_{i}.csv": bytes([i]) * (i + 1) * 1000 for i in range(16)}
+    resource = zip_resource(tmp_path, entries)
+
+    assert dscer.ZipfileProcessor("out").process(resource)
+
+    for name, data in entries.items():
+        assert (tmp_path / "out" / name).read_bytes() == data
+
+    assert set(extracted_on) == set(entries)
+    assert threading.current_thread() not in extracted_on.values()
+
+
+def test_entries_outside_the_unzip_dir_are_skipped(tmp_path, caplog):
+    resource = zip_resource(tmp_path, {**ENTRIES, "../escaped.csv": b"x"})
+
+    with caplog.at_level(logging.ERROR):
+        assert not dscer.ZipfileProcessor("out").process(resource)
+
+    assert not (tmp_path / "escaped.csv").exists()
+    assert "outside of the unzip dir" in caplog.text
+
+    # the rest of the archive is still extracted
+    for name, data in ENTRIES.items():
+        assert (tmp_path / "out" / name).read_bytes() == data